@@ -1,22 +1,55 @@
 #!/usr/bin/env python3
 """A github org client
 """
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
 from typing import (
     List,
     Dict,
+    Iterator,
+    Optional,
+    Sequence,
+    Tuple,
 )
 
 from utils import (
+    DEFAULT_TIMEOUT,
+    RateLimiter,
     get_json,
-    access_nested_map,
+    get_json_page,
+    get_json_stream,
+    get_session,
+    compile_path,
+    extract_paths,
     memoize,
 )
 
+_license_key = compile_path(("license", "key"))
+_NAME_AND_LICENSE = (("name",), ("license", "key"))
+
+
+def _page_urls(last_url: str, first: int = 2) -> List[str]:
+    """URLs of pages first..N given the rel="last" link of page N"""
+    parts = urlsplit(last_url)
+    query = parse_qs(parts.query)
+    last = int(query["page"][0])
+    urls = []
+    for page in range(first, last + 1):
+        query["page"] = [str(page)]
+        urls.append(urlunsplit(parts._replace(
+            query=urlencode(query, doseq=True))))
+    return urls
+
 
 class GithubOrgClient:
     """A Githib org client
     """
     ORG_URL = "https://api.github.com/orgs/{org}"
+    REPOS_PER_PAGE = 100
+    MAX_PAGE_WORKERS = 8
 
     def __init__(self, org_name: str) -> None:
         """Init method of GithubOrgClient"""
@@ -33,26 +66,241 @@ class GithubOrgClient:
         return self.org["repos_url"]
 
     @memoize
-    def repos_payload(self) -> Dict:
-        """Memoize repos payload"""
-        return get_json(self._public_repos_url)
+    def repos_payload(self) -> List[Dict]:
+        """Memoize repos payload, merged from every page in order.
+        Once the first page reveals the last page number, the remaining
+        pages are fetched concurrently; otherwise rel="next" is followed.
+        """
+        first, links = get_json_page(self._public_repos_url,
+                                     {"per_page": self.REPOS_PER_PAGE})
+        payload = list(first)
+        if "last" in links:
+            urls = _page_urls(links["last"])
+            if urls:
+                workers = min(self.MAX_PAGE_WORKERS, len(urls))
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    for page in pool.map(get_json, urls):
+                        payload.extend(page)
+        else:
+            while "next" in links:
+                page, links = get_json_page(links["next"])
+                payload.extend(page)
+        return payload
+
+    def invalidate_repos(self) -> None:
+        """Drop the memoized repos payload and its license index"""
+        self.__dict__.pop("_repos_payload", None)
+        self.__dict__.pop("_license_index", None)
+
+    @property
+    def license_index(self) -> Dict[str, List[str]]:
+        """License key -> repo names, built once per repos payload.
+        The index remembers the payload it was built from, so a new
+        payload (refetched or replaced) rebuilds it on next use.
+        """
+        payload = self.repos_payload
+        cached: Tuple[List[Dict], Dict[str, List[str]]] = \
+            self.__dict__.get("_license_index")
+        if cached is not None and cached[0] is payload:
+            return cached[1]
+        index: Dict[str, List[str]] = {}
+        for name, key in extract_paths(payload, _NAME_AND_LICENSE,
+                                       default=None):
+            if key is not None:
+                index.setdefault(key, []).append(name)
+        self._license_index = (payload, index)
+        return index
+
+    def license_counts(self) -> Dict[str, int]:
+        """Number of public repos per license key"""
+        return {key: len(names) for key, names in self.license_index.items()}
 
     def public_repos(self, license: str = None) -> List[str]:
         """Public repos"""
+        if license is not None:
+            return list(self.license_index.get(license, ()))
         json_payload = self.repos_payload
-        public_repos = [
-            repo["name"] for repo in json_payload
-            if license is None or self.has_license(repo, license)
-        ]
+        public_repos = [repo["name"] for repo in json_payload]
 
         return public_repos
 
+    def iter_public_repos(self, license: str = None) -> Iterator[str]:
+        """Stream public repo names page by page.
+        Unlike public_repos nothing is memoized: each page is decoded as
+        it arrives and only name and license key are kept per repo, so
+        memory stays flat for orgs with tens of thousands of repos.
+        """
+        url, params = self._public_repos_url, {
+            "per_page": self.REPOS_PER_PAGE}
+        while url:
+            records, links = get_json_stream(url, _NAME_AND_LICENSE, params)
+            for name, key in records:
+                if license is None or key == license:
+                    yield name
+            url, params = links.get("next"), None
+
     @staticmethod
     def has_license(repo: Dict[str, Dict], license_key: str) -> bool:
         """Static: has_license"""
         assert license_key is not None, "license_key cannot be None"
         try:
-            has_license = access_nested_map(repo, ("license", "key")) == license_key
+            has_license = _license_key(repo) == license_key
         except KeyError:
             return False
         return has_license
+
+
+class GithubBatchClient:
+    """Fetch many orgs and all their repos concurrently, within the
+    API rate limit.
+    Requests are paced by a shared RateLimiter. Repo pages of orgs
+    already started are queued ahead of new org lookups, so a low
+    budget finishes orgs instead of starting more of them.
+    Example
+    -------
+    >>> clients = GithubBatchClient().fetch(["google", "abc"])
+    >>> clients["google"].public_repos("mit")
+    """
+    MAX_WORKERS = 8
+    MAX_ATTEMPTS = 5
+    _PAGE, _ORG = 0, 1  # queue priorities, lowest first
+
+    def __init__(self, max_workers: int = MAX_WORKERS,
+                 limiter: Optional[RateLimiter] = None) -> None:
+        """Init method of GithubBatchClient"""
+        self.max_workers = max_workers
+        self.limiter = limiter or RateLimiter()
+        self.errors: Dict[str, Exception] = {}
+
+    def fetch(self, org_names: Sequence[str]) -> Dict[str, GithubOrgClient]:
+        """GithubOrgClient per org with org and repos_payload loaded.
+        Orgs that failed are left out and their error kept in errors.
+        """
+        self.errors = {}
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._outstanding = 0
+        self._clients: Dict[str, GithubOrgClient] = {}
+        self._pages: Dict[str, Dict[int, List[Dict]]] = {}
+        self._last_page: Dict[str, int] = {}
+        for rank, org_name in enumerate(org_names):
+            self._put(self._ORG, rank, org_name, 0,
+                      GithubOrgClient.ORG_URL.format(org=org_name), None)
+        if self._outstanding:
+            workers = [threading.Thread(target=self._work, daemon=True)
+                       for _ in range(self.max_workers)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        return {name: self._clients[name] for name in org_names
+                if name in self._clients and name not in self.errors}
+
+    def _put(self, priority: int, rank: int, org_name: str, page: int,
+             url: str, params: Optional[Dict], attempt: int = 1) -> None:
+        """Queue one request; pages of earlier orgs come out first"""
+        with self._lock:
+            self._outstanding += 1
+        self._queue.put((priority, rank, page, next(self._seq),
+                         (org_name, url, params, attempt)))
+
+    def _done(self) -> None:
+        """Mark a request finished; wake every worker after the last"""
+        with self._lock:
+            self._outstanding -= 1
+            finished = self._outstanding == 0
+        if finished:
+            self._queue.put((float("inf"), 0, 0, 0, None))
+
+    def _work(self) -> None:
+        """Take the most urgent request once the rate limit allows one"""
+        while True:
+            item = self._queue.get()
+            if item[-1] is None:
+                self._queue.put(item)
+                return
+            # Wait for the budget (and any Retry-After block) only once a
+            # request is in hand, so nothing is sent from a stale pass
+            self.limiter.acquire()
+            # A more urgent request may have been queued while we waited
+            self._queue.put(item)
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                self.limiter.cancel()
+                continue
+            if item[-1] is None:
+                # Another worker took ours and finished the batch
+                self._queue.put(item)
+                self.limiter.cancel()
+                return
+            priority, rank, page, _, task = item
+            org_name, url, params, attempt = task
+            try:
+                response = get_session().get(url, params=params,
+                                             timeout=DEFAULT_TIMEOUT)
+            except Exception as e:
+                self.limiter.cancel()
+                self._fail(org_name, e)
+                continue
+            if self.limiter.release(response.status_code, response.headers) \
+                    and attempt < self.MAX_ATTEMPTS:
+                self._put(priority, rank, org_name, page, url, params,
+                          attempt + 1)
+                self._done()
+                continue
+            try:
+                response.raise_for_status()
+                body = response.json()
+                links = {rel: link["url"]
+                         for rel, link in response.links.items()}
+                if priority == self._ORG:
+                    self._got_org(rank, org_name, body)
+                else:
+                    self._got_page(rank, org_name, page, body, links)
+            except Exception as e:
+                self._fail(org_name, e)
+            else:
+                self._done()
+
+    def _fail(self, org_name: str, error: Exception) -> None:
+        """Record the first error of an org"""
+        with self._lock:
+            self.errors.setdefault(org_name, error)
+        self._done()
+
+    def _got_org(self, rank: int, org_name: str, body: Dict) -> None:
+        """Keep the org and queue its first repos page"""
+        client = GithubOrgClient(org_name)
+        client._org = body  # what @memoize would have stored
+        with self._lock:
+            self._clients[org_name] = client
+            self._pages[org_name] = {}
+        self._put(self._PAGE, rank, org_name, 1, client._public_repos_url,
+                  {"per_page": GithubOrgClient.REPOS_PER_PAGE})
+
+    def _got_page(self, rank: int, org_name: str, page: int,
+                  body: List[Dict], links: Dict[str, str]) -> None:
+        """Keep a repos page; queue the pages after it; finish the org"""
+        with self._lock:
+            following_next = org_name not in self._last_page
+        if page == 1 and "last" in links:
+            urls = _page_urls(links["last"])
+            with self._lock:
+                self._last_page[org_name] = len(urls) + 1
+            for number, url in enumerate(urls, 2):
+                self._put(self._PAGE, rank, org_name, number, url, None)
+        elif following_next and "next" in links:
+            self._put(self._PAGE, rank, org_name, page + 1, links["next"],
+                      None)
+        elif following_next:
+            with self._lock:
+                self._last_page[org_name] = page
+        with self._lock:
+            pages = self._pages[org_name]
+            pages[page] = body
+            if len(pages) == self._last_page.get(org_name):
+                self._clients[org_name]._repos_payload = [
+                    repo for number in sorted(pages) for repo in pages[number]
+                ]
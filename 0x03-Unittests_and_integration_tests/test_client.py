@@ -3,11 +3,19 @@
 
 import os
 import sys
+import json
+import time
+import queue
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 import requests
 from parameterized import parameterized, parameterized_class
 from unittest.mock import patch, PropertyMock, Mock
-from client import GithubOrgClient
+import client as client_module
+from client import GithubBatchClient, GithubOrgClient
+from utils import RateLimiter, configure_session
 from fixtures import (
     org_payload,
     repos_payload,
@@ -49,17 +57,17 @@ class TestGithubOrgClient(unittest.TestCase):
                 "https://api.github.com/orgs/test/repos"
             )
 
-    @patch("client.get_json")
+    @patch("client.get_json_page")
     def test_public_repos(self, mock_get_json):
-        """Test that public_repos returns repo names and calls get_json.
-        Ensure get_json and _public_repos_url are called once.
+        """Test that public_repos returns repo names and calls get_json_page.
+        Ensure get_json_page and _public_repos_url are called once.
         """
         repos_payload = [
             {"name": "repo1", "license": {"key": "mit"}},
             {"name": "repo2", "license": {"key": "apache-2.0"}},
             {"name": "repo3", "license": None},
         ]
-        mock_get_json.return_value = repos_payload
+        mock_get_json.return_value = (repos_payload, {})
         client = GithubOrgClient("test")
         with patch.object(
             GithubOrgClient, "_public_repos_url", new_callable=PropertyMock
@@ -68,7 +76,62 @@ class TestGithubOrgClient(unittest.TestCase):
             result = client.public_repos()
             self.assertEqual(sorted(result), ["repo1", "repo2", "repo3"])
             mock_url.assert_called_once()
-            mock_get_json.assert_called_once_with(mock_url.return_value)
+            mock_get_json.assert_called_once_with(
+                mock_url.return_value,
+                {"per_page": GithubOrgClient.REPOS_PER_PAGE})
+
+    def test_license_index(self):
+        """License lookups and counts come from one index per payload."""
+        repos = [
+            {"name": "repo1", "license": {"key": "mit"}},
+            {"name": "repo2", "license": {"key": "apache-2.0"}},
+            {"name": "repo3", "license": None},
+            {"name": "repo4", "license": {"key": "mit"}},
+            {"name": "repo5"},
+        ]
+        client = GithubOrgClient("test")
+        with patch.object(
+            GithubOrgClient, "repos_payload", new_callable=PropertyMock
+        ) as mock_payload:
+            mock_payload.return_value = repos
+            with patch("client.extract_paths",
+                       wraps=client_module.extract_paths) as mock_extract:
+                self.assertEqual(client.public_repos("mit"),
+                                 ["repo1", "repo4"])
+                self.assertEqual(client.public_repos("apache-2.0"),
+                                 ["repo2"])
+                self.assertEqual(client.public_repos("gpl-3.0"), [])
+                self.assertEqual(client.license_counts(),
+                                 {"mit": 2, "apache-2.0": 1})
+                mock_extract.assert_called_once()
+
+                # Callers cannot corrupt the index through the result
+                client.public_repos("mit").append("oops")
+                self.assertEqual(client.public_repos("mit"),
+                                 ["repo1", "repo4"])
+
+                mock_payload.return_value = repos[:1]
+                self.assertEqual(client.license_counts(), {"mit": 1})
+                self.assertEqual(mock_extract.call_count, 2)
+
+    @patch("client.get_json_page")
+    def test_invalidate_repos(self, mock_get_json_page):
+        """invalidate_repos refetches the payload and rebuilds the index."""
+        mock_get_json_page.return_value = (
+            [{"name": "repo1", "license": {"key": "mit"}}], {})
+        client = GithubOrgClient("test")
+        with patch.object(
+            GithubOrgClient, "_public_repos_url", new_callable=PropertyMock
+        ) as mock_url:
+            mock_url.return_value = "https://api.github.com/orgs/test/repos"
+            self.assertEqual(client.public_repos("mit"), ["repo1"])
+            mock_get_json_page.return_value = (
+                [{"name": "repo2", "license": {"key": "bsd-3-clause"}}], {})
+            self.assertEqual(client.public_repos("mit"), ["repo1"])
+            client.invalidate_repos()
+            self.assertEqual(client.public_repos("mit"), [])
+            self.assertEqual(client.license_counts(), {"bsd-3-clause": 1})
+            self.assertEqual(mock_get_json_page.call_count, 2)
 
     @parameterized.expand([
         ({"license": {"key": "my_license"}}, "my_license", True),
@@ -89,12 +152,12 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
     """Integration tests for GithubOrgClient.public_repos."""
     @classmethod
     def setUpClass(cls):
-        """Start patching requests.get for integration tests."""
-        cls.get_patcher = patch("requests.get")
+        """Start patching the shared session's get for integration tests."""
+        cls.get_patcher = patch("requests.Session.get")
         cls.mock_get = cls.get_patcher.start()
 
         def get_side_effect(url, *args, **kwargs):
-            mock_resp = Mock()
+            mock_resp = Mock(headers={})
             if url.endswith("/repos"):
                 mock_resp.json.return_value = cls.repos_payload
             else:
@@ -105,7 +168,7 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        """Stop patching requests.get."""
+        """Stop patching the shared session's get."""
         cls.get_patcher.stop()
 
     def test_public_repos(self):
@@ -122,5 +185,330 @@ class TestIntegrationGithubOrgClient(unittest.TestCase):
             sorted(self.apache2_repos))
 
 
+class _PaginatedAPI(BaseHTTPRequestHandler):
+    """Fake GitHub API: one org whose repos are split into pages."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out separately
+    total_repos = 250
+    with_last = True
+    delay = 0.02
+    in_flight = 0
+    max_in_flight = 0
+    page_requests = 0
+
+    def do_GET(self):
+        """Serve the org or one page of its repos with Link headers."""
+        parts = urlsplit(self.path)
+        base = "http://{}".format(self.headers["Host"])
+        links = []
+        if not parts.path.endswith("/repos"):
+            body = {"login": parts.path.rsplit("/", 1)[-1],
+                    "repos_url": base + parts.path + "/repos"}
+        else:
+            cls = type(self)
+            with self.server.lock:
+                cls.in_flight += 1
+                cls.page_requests += 1
+                cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            time.sleep(self.delay)
+            query = parse_qs(parts.query)
+            page = int(query.get("page", ["1"])[0])
+            per_page = int(query.get("per_page", ["30"])[0])
+            last = -(-self.total_repos // per_page)
+            start = (page - 1) * per_page
+            body = [
+                {"name": "repo{}".format(i),
+                 "license": {"key": "mit" if i % 2 else "apache-2.0"}}
+                for i in range(start, min(start + per_page,
+                                          self.total_repos))
+            ]
+            url = base + parts.path + "?per_page={}&page={}"
+            if page < last:
+                links.append('<{}>; rel="next"'.format(
+                    url.format(per_page, page + 1)))
+            if self.with_last:
+                links.append('<{}>; rel="last"'.format(
+                    url.format(per_page, last)))
+            with self.server.lock:
+                cls.in_flight -= 1
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if links:
+            self.send_header("Link", ", ".join(links))
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        """Keep test output quiet."""
+
+
+class TestPaginatedPublicRepos(unittest.TestCase):
+    """public_repos against a local fake paginated API."""
+
+    def setUp(self):
+        """Start the fake API and point the client at it."""
+        self.handler = type("Handler", (_PaginatedAPI,), {})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever,
+                         kwargs={"poll_interval": 0.05}, daemon=True).start()
+        base = "http://127.0.0.1:{}".format(self.server.server_port)
+        patchers = [
+            patch.object(GithubOrgClient, "ORG_URL", base + "/orgs/{org}"),
+            patch.object(GithubOrgClient, "REPOS_PER_PAGE", 10),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        configure_session()
+
+    def tearDown(self):
+        """Stop the fake API."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fetches_every_page_concurrently_in_order(self):
+        """All 25 pages are merged in page order, several at a time."""
+        repos = GithubOrgClient("big").public_repos()
+        self.assertEqual(repos, ["repo{}".format(i) for i in range(250)])
+        self.assertEqual(self.handler.page_requests, 25)
+        self.assertGreater(self.handler.max_in_flight, 1)
+        self.assertLessEqual(self.handler.max_in_flight,
+                             GithubOrgClient.MAX_PAGE_WORKERS)
+
+    def test_follows_next_links_without_last(self):
+        """Without rel="last" pages are followed one by one."""
+        self.handler.with_last = False
+        repos = GithubOrgClient("big").public_repos()
+        self.assertEqual(repos, ["repo{}".format(i) for i in range(250)])
+        self.assertEqual(self.handler.max_in_flight, 1)
+
+    def test_license_filter_spans_pages(self):
+        """Filtering by license sees repos from every page."""
+        client = GithubOrgClient("big")
+        self.assertEqual(len(client.public_repos("mit")), 125)
+        self.assertEqual(len(client.public_repos("apache-2.0")), 125)
+        self.assertEqual(self.handler.page_requests, 25)
+
+    def test_iter_public_repos_streams_every_page(self):
+        """iter_public_repos follows rel="next" and filters as it goes."""
+        client = GithubOrgClient("big")
+        self.assertEqual(list(client.iter_public_repos("mit")),
+                         ["repo{}".format(i) for i in range(1, 250, 2)])
+        self.assertEqual(self.handler.page_requests, 25)
+        self.assertFalse(hasattr(client, "_repos_payload"))
+
+
+class _RateLimitedAPI(_PaginatedAPI):
+    """Fake paginated API allowing `limit` requests per wall-clock second,
+    like GitHub's X-RateLimit-* headers; over the limit it answers 403.
+    With retry_after set, request number retry_after_at gets a 429 with
+    Retry-After.
+    """
+    total_repos = 25
+    limit = 15
+    retry_after = None
+    retry_after_at = 1
+    window = 0
+    used = 0
+    rejected = 0
+    blocked_from = 0.0
+    blocked_until = 0.0
+    early = 0
+    paths = []
+
+    def do_GET(self):
+        """Apply the rate limit, then serve like _PaginatedAPI."""
+        cls = type(self)
+        now = time.time()
+        with self.server.lock:
+            if int(now) != cls.window:
+                cls.window, cls.used = int(now), 0
+            cls.used += 1
+            remaining = cls.limit - cls.used
+            if cls.blocked_from <= now < cls.blocked_until:
+                cls.early += 1
+            cls.paths.append(urlsplit(self.path).path)
+            retry_after = None
+            if len(cls.paths) == cls.retry_after_at:
+                retry_after, cls.retry_after = cls.retry_after, None
+            if retry_after is not None:
+                cls.blocked_until = now + retry_after
+        self.rate_headers = {
+            "X-RateLimit-Limit": str(cls.limit),
+            "X-RateLimit-Remaining": str(max(0, remaining)),
+            "X-RateLimit-Reset": str(cls.window + 1),
+        }
+        if remaining < 0:
+            with self.server.lock:
+                cls.rejected += 1
+            self._refuse(403, {})
+        elif retry_after is not None:
+            self._refuse(429, {"Retry-After": str(retry_after)})
+            # Requests sent before the client read the 429 are not early
+            with self.server.lock:
+                cls.blocked_from = time.time() + 0.01
+        else:
+            super().do_GET()
+
+    def _refuse(self, status, headers):
+        """Answer with an error status and extra headers."""
+        payload = b'{"message": "API rate limit exceeded"}'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def end_headers(self):
+        """Add the rate limit headers to every response."""
+        for name, value in self.rate_headers.items():
+            self.send_header(name, value)
+        super().end_headers()
+
+
+class TestGithubBatchClient(unittest.TestCase):
+    """GithubBatchClient against a local rate-limited fake API."""
+
+    def setUp(self):
+        """Start the fake API and point the client at it."""
+        self.handler = type("Handler", (_RateLimitedAPI,), {"paths": []})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        threading.Thread(target=self.server.serve_forever,
+                         kwargs={"poll_interval": 0.05}, daemon=True).start()
+        base = "http://127.0.0.1:{}".format(self.server.server_port)
+        patchers = [
+            patch.object(GithubOrgClient, "ORG_URL", base + "/orgs/{org}"),
+            patch.object(GithubOrgClient, "REPOS_PER_PAGE", 10),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        configure_session()
+
+    def tearDown(self):
+        """Stop the fake API."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fetches_many_orgs_within_rate_limit(self):
+        """40 requests at 15/s: every org arrives, no request is refused."""
+        orgs = ["org{}".format(i) for i in range(10)]
+        started = time.time()
+        batch = GithubBatchClient()
+        clients = batch.fetch(orgs)
+        elapsed = time.time() - started
+        self.assertEqual(list(clients), orgs)
+        self.assertEqual(batch.errors, {})
+        for client in clients.values():
+            self.assertEqual(client.public_repos(),
+                             ["repo{}".format(i) for i in range(25)])
+            self.assertEqual(len(client.public_repos("mit")), 12)
+        self.assertEqual(len(self.handler.paths), 40)
+        self.assertEqual(self.handler.rejected, 0)
+        self.assertGreater(self.handler.max_in_flight, 1)
+        # 40 requests need 3 one-second windows; waiting must not cost more
+        self.assertLess(elapsed, 3.5)
+
+    def test_started_orgs_come_first(self):
+        """Repo pages of a started org are fetched before the next org."""
+        self.handler.limit = 1000
+        GithubBatchClient(max_workers=1).fetch(["a", "b"])
+        self.assertEqual(self.handler.paths, [
+            "/orgs/a", "/orgs/a/repos", "/orgs/a/repos", "/orgs/a/repos",
+            "/orgs/b", "/orgs/b/repos", "/orgs/b/repos", "/orgs/b/repos",
+        ])
+
+    def test_honors_retry_after(self):
+        """After a 429 with Retry-After no request comes before it ends."""
+        self.handler.limit = 1000
+        self.handler.retry_after = 0.3
+        batch = GithubBatchClient()
+        clients = batch.fetch(["a", "b"])
+        self.assertEqual(batch.errors, {})
+        self.assertEqual(len(clients["a"].public_repos()), 25)
+        self.assertEqual(len(clients["b"].public_repos()), 25)
+        self.assertEqual(self.handler.early, 0)
+        self.assertEqual(len(self.handler.paths), 9)
+
+    def test_honors_retry_after_mid_batch(self):
+        """A 429 while other workers are busy also holds every worker."""
+        self.handler.limit = 1000
+        self.handler.retry_after = 0.3
+        self.handler.retry_after_at = 12
+        orgs = ["org{}".format(i) for i in range(6)]
+        batch = GithubBatchClient()
+        clients = batch.fetch(orgs)
+        self.assertEqual(batch.errors, {})
+        self.assertEqual(list(clients), orgs)
+        self.assertEqual(self.handler.early, 0)
+        self.assertEqual(len(self.handler.paths), 25)
+
+    def test_missing_org_is_reported(self):
+        """An org that cannot be fetched is left out with its error."""
+        self.handler.limit = 1000
+        with patch.object(GithubOrgClient, "ORG_URL",
+                          "http://127.0.0.1:1/orgs/{org}"):
+            batch = GithubBatchClient()
+            clients = batch.fetch(["a"])
+        self.assertEqual(clients, {})
+        self.assertIn("a", batch.errors)
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Budget bookkeeping of utils.RateLimiter."""
+
+    def test_stop_marker_taken_after_acquire_is_kept(self):
+        """A worker that finds the batch finished after acquire() exits,
+        handing the stop marker on and its limiter slot back.
+        """
+        batch = GithubBatchClient(max_workers=1)
+        batch.fetch([])
+        stop = (float("inf"), 0, 0, 0, None)
+
+        class RacingQueue(queue.PriorityQueue):
+            """Another worker takes the re-queued request and finishes."""
+            raced = True
+
+            def put(self, item, *args, **kwargs):
+                super().put(item, *args, **kwargs)
+                if item[-1] is not None and not self.raced:
+                    self.raced = True
+                    self.get_nowait()
+                    super().put(stop)
+
+        batch._queue = RacingQueue()
+        batch._queue.put((batch._ORG, 0, 0, 0, ("abc", "url", None, 1)))
+        batch._queue.raced = False  # race the put after acquire()
+        batch._work()
+        self.assertEqual(batch._queue.get_nowait(), stop)
+        self.assertEqual(batch.limiter.in_flight, 0)
+
+    def test_waits_for_reset_when_budget_is_spent(self):
+        """With no budget left acquire blocks until the reset time."""
+        limiter = RateLimiter()
+        limiter.acquire()
+        reset = time.time() + 0.2
+        limiter.release(200, {"X-RateLimit-Remaining": "0",
+                              "X-RateLimit-Reset": str(reset)})
+        limiter.acquire()
+        self.assertGreaterEqual(time.time(), reset)
+
+    def test_unmetered_api_is_not_serialized(self):
+        """Without rate limit headers requests are not throttled."""
+        limiter = RateLimiter()
+        limiter.acquire()
+        limiter.release(200, {})
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(limiter.in_flight, 2)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,8 +1,27 @@
 #!/usr/bin/env python3
 """Unit tests for utils.access_nested_map"""
+import gzip
+import json
+import time
+import tempfile
+import threading
+import tracemalloc
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
 from parameterized import parameterized
-from utils import access_nested_map, memoize
+import utils
+from utils import (
+    access_nested_map,
+    compile_path,
+    extract_paths,
+    memoize,
+    memoize_with,
+    configure_session,
+    configure_http_cache,
+    get_json_stream,
+    iter_json_array,
+)
 from unittest.mock import patch, Mock
 
 
@@ -37,6 +56,52 @@ class TestAccessNestedMap(unittest.TestCase):
         self.assertEqual(str(cm.exception), repr(path[-1]))
 
 
+class TestCompiledPaths(unittest.TestCase):
+    """Tests for compile_path and extract_paths."""
+
+    @parameterized.expand([
+        ({"a": 1}, ("a",)),
+        ({"a": {"b": 2}}, ("a",)),
+        ({"a": {"b": 2}}, ("a", "b")),
+        ({"a": {"b": 2}}, ()),
+    ])
+    def test_compile_path(self, nested_map, path):
+        """A compiled path reads what access_nested_map reads."""
+        self.assertEqual(compile_path(path)(nested_map),
+                         access_nested_map(nested_map, path))
+
+    @parameterized.expand([
+        ({}, ("a",)),
+        ({"a": 1}, ("a", "b")),
+        ({"a": [1]}, ("a", 0)),
+    ])
+    def test_compile_path_exception(self, nested_map, path):
+        """Missing paths raise the same KeyError as access_nested_map."""
+        with self.assertRaises(KeyError) as cm:
+            compile_path(path)(nested_map)
+        self.assertEqual(str(cm.exception), repr(path[-1]))
+        self.assertIsNone(compile_path(path, default=None)(nested_map))
+
+    def test_compile_path_unhashable_key(self):
+        """Invalid paths are rejected when compiled."""
+        with self.assertRaises(TypeError):
+            compile_path(("a", ["b"]))
+
+    def test_extract_paths(self):
+        """extract_paths reads every path from every record."""
+        repos = [
+            {"name": "a", "license": {"key": "mit"}},
+            {"name": "b", "license": None},
+            {"name": "c"},
+        ]
+        paths = [("name",), ("license", "key")]
+        self.assertEqual(extract_paths(repos, paths, default=None),
+                         [("a", "mit"), ("b", None), ("c", None)])
+        with self.assertRaises(KeyError) as cm:
+            extract_paths(repos, paths)
+        self.assertEqual(str(cm.exception), repr("key"))
+
+
 class TestGetJson(unittest.TestCase):
     """Tests for the get_json utility function."""
 
@@ -44,18 +109,295 @@ class TestGetJson(unittest.TestCase):
         ("http://example.com", {"payload": True}),
         ("http://holberton.io", {"payload": False}),
     ])
-    @patch("utils.requests.get")
-    def test_get_json(self, test_url, test_payload, mock_get):
-        """Test get_json returns payload and calls requests.get once."""
-        mock_response = Mock()
+    @patch("utils.get_session")
+    def test_get_json(self, test_url, test_payload, mock_get_session):
+        """Test get_json returns payload and calls session.get once."""
+        mock_response = Mock(headers={})
         mock_response.json.return_value = test_payload
+        mock_get = mock_get_session.return_value.get
         mock_get.return_value = mock_response
 
         from utils import get_json
         result = get_json(test_url)
 
         self.assertEqual(result, test_payload)
-        mock_get.assert_called_once_with(test_url)
+        mock_get.assert_called_once_with(
+            test_url, timeout=utils.DEFAULT_TIMEOUT)
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    """Keep-alive JSON endpoint counting TCP connections it accepts."""
+    protocol_version = "HTTP/1.1"
+    connections = 0
+    gzipped = 0
+    delay = 0
+
+    def setup(self):
+        """Count every new connection."""
+        super().setup()
+        type(self).connections += 1
+
+    def do_GET(self):
+        """Answer with the request path, gzipped when the client allows."""
+        time.sleep(self.delay)
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+            type(self).gzipped += 1
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Keep test output quiet."""
+
+
+class _QuietServer(ThreadingHTTPServer):
+    """Test server that ignores clients hanging up mid-response."""
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        """Timed-out clients close early; that is expected here."""
+
+
+class TestGetJsonSession(unittest.TestCase):
+    """get_json against a local HTTP stand-in server."""
+
+    def setUp(self):
+        """Start a fresh server (with its own counters) and session."""
+        self.handler = type("Handler", (_JSONHandler,), {})
+        self.server = _QuietServer(("127.0.0.1", 0), self.handler)
+        threading.Thread(target=self.server.serve_forever,
+                         kwargs={"poll_interval": 0.05}, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/orgs/test".format(
+            self.server.server_port)
+        configure_session(pool_size=2)
+
+    def tearDown(self):
+        """Stop the server and drop pooled connections."""
+        configure_session()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_repeated_calls_reuse_one_connection(self):
+        """Pooled get_json pays one handshake; bare requests.get pays many."""
+        for _ in range(20):
+            self.assertEqual(utils.get_json(self.url), {"path": "/orgs/test"})
+        self.assertEqual(self.handler.connections, 1)
+        self.assertEqual(self.handler.gzipped, 20)
+
+        for _ in range(20):
+            requests.get(self.url, headers={"Connection": "close"}).json()
+        self.assertEqual(self.handler.connections, 21)
+
+    def test_read_timeout(self):
+        """A slow server raises instead of hanging the caller."""
+        self.handler.delay = 0.3
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            utils.get_json(self.url, timeout=(1, 0.1))
+
+
+class _ETagHandler(_JSONHandler):
+    """JSON endpoint honouring If-None-Match / If-Modified-Since."""
+    etag = '"v1"'
+    last_modified = "Mon, 01 Jan 2024 00:00:00 GMT"
+    full = 0
+    not_modified = 0
+
+    def do_GET(self):
+        """Reply 304 when the client's validators are current."""
+        if (self.headers.get("If-None-Match") == self.etag
+                or self.headers.get("If-Modified-Since")
+                == self.last_modified):
+            type(self).not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        type(self).full += 1
+        body = json.dumps({"path": self.path, "etag": self.etag}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", self.etag)
+        self.send_header("Last-Modified", self.last_modified)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestGetJsonDiskCache(unittest.TestCase):
+    """get_json revalidates bodies cached on disk."""
+
+    def setUp(self):
+        """Start a server and point the cache at a scratch directory."""
+        self.handler = type("Handler", (_ETagHandler,), {})
+        self.server = _QuietServer(("127.0.0.1", 0), self.handler)
+        threading.Thread(target=self.server.serve_forever,
+                         kwargs={"poll_interval": 0.05}, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/orgs/test".format(
+            self.server.server_port)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        configure_session()
+
+    def tearDown(self):
+        """Stop the server and disable the cache."""
+        configure_http_cache(None)
+        self.server.shutdown()
+        self.server.server_close()
+        self.cache_dir.cleanup()
+
+    def test_revalidates_across_runs(self):
+        """Later "processes" only get 304s and read the body from disk."""
+        configure_http_cache(self.cache_dir.name)
+        first = utils.get_json(self.url)
+        self.assertEqual((self.handler.full, self.handler.not_modified),
+                         (1, 0))
+
+        for _ in range(3):
+            # A new cache object on the same directory, like a new process
+            configure_http_cache(self.cache_dir.name)
+            self.assertEqual(utils.get_json(self.url), first)
+        self.assertEqual((self.handler.full, self.handler.not_modified),
+                         (1, 3))
+
+    def test_changed_resource_is_refetched(self):
+        """A new ETag on the server replaces the cached body."""
+        configure_http_cache(self.cache_dir.name)
+        utils.get_json(self.url)
+        self.handler.etag = '"v2"'
+        self.handler.last_modified = "Tue, 02 Jan 2024 00:00:00 GMT"
+        self.assertEqual(utils.get_json(self.url)["etag"], '"v2"')
+        self.assertEqual(utils.get_json(self.url)["etag"], '"v2"')
+        self.assertEqual((self.handler.full, self.handler.not_modified),
+                         (2, 1))
+
+    def test_disabled_by_default(self):
+        """Without a cache directory every call downloads the body."""
+        utils.get_json(self.url)
+        utils.get_json(self.url)
+        self.assertEqual((self.handler.full, self.handler.not_modified),
+                         (2, 0))
+
+
+def _chunked(data, size):
+    """Split bytes into chunks of size bytes."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+SPLIT_DOC = [1, 23, -4.5e3, 523.4765094016288, 1.5e+300, -2e-300,
+             "a\"b]", "\u00fc\u20ac", None, True, [],
+             {"name": "repo", "license": {"key": "mit"}}]
+SPLIT_DATA = json.dumps(SPLIT_DOC, ensure_ascii=False, indent=1).encode()
+
+
+class TestIterJsonArray(unittest.TestCase):
+    """Tests for the incremental JSON array decoder."""
+
+    @parameterized.expand([(1,), (3,), (7,), (4096,)])
+    def test_chunk_boundaries(self, chunk_size):
+        """Elements split anywhere (numbers, escapes, UTF-8) decode whole."""
+        self.assertEqual(list(iter_json_array(_chunked(SPLIT_DATA,
+                                                       chunk_size))),
+                         SPLIT_DOC)
+
+    def test_split_at_every_offset(self):
+        """Two chunks decode whole wherever the first one ends."""
+        for offset in range(1, len(SPLIT_DATA)):
+            with self.subTest(offset=offset):
+                chunks = [SPLIT_DATA[:offset], SPLIT_DATA[offset:]]
+                self.assertEqual(list(iter_json_array(chunks)), SPLIT_DOC)
+
+    @parameterized.expand([
+        ([b"[1.", b"5]"], [1.5]),
+        ([b"[1e", b"3]"], [1000.0]),
+        ([b"[1.5E", b"+3]"], [1500.0]),
+        ([b"[523.", b"4765, {}]"], [523.4765, {}]),
+        ([b"[1]", b" \n"], [1]),
+    ])
+    def test_number_split_after_dot_or_exponent(self, chunks, expected):
+        """A number cut right after '.', 'e' or its sign decodes whole."""
+        self.assertEqual(list(iter_json_array(chunks)), expected)
+
+    @parameterized.expand([
+        (b"",), (b"[1, 2",), (b'{"a": 1}',), (b"[1 2]",), (b"[1,]",),
+        (b"[1]x",), (b"[] []",), (b"[1]]",),
+    ])
+    def test_malformed(self, data):
+        """Malformed or truncated input raises like json.loads."""
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_array(_chunked(data, 2)))
+
+
+class _ReposHandler(_JSONHandler):
+    """Serves one large JSON array of repos in small writes."""
+    body = b"[]"
+
+    def do_GET(self):
+        """Send the prepared body with a Link header."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Link", '<{}?page=2>; rel="next"'.format(self.path))
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        view = memoryview(self.body)
+        for start in range(0, len(view), 16384):
+            self.wfile.write(view[start:start + 16384])
+
+
+class TestGetJsonStream(unittest.TestCase):
+    """get_json_stream decodes large payloads with bounded memory."""
+
+    def setUp(self):
+        """Serve 20000 repos (several MB) from a local server."""
+        repos = [
+            {"name": "repo{}".format(i), "description": "x" * 300,
+             "license": {"key": "mit"} if i % 2 else None}
+            for i in range(20000)
+        ]
+        self.handler = type("Handler", (_ReposHandler,), {
+            "body": json.dumps(repos).encode()})
+        self.server = _QuietServer(("127.0.0.1", 0), self.handler)
+        threading.Thread(target=self.server.serve_forever,
+                         kwargs={"poll_interval": 0.05}, daemon=True).start()
+        self.url = "http://127.0.0.1:{}/repos".format(
+            self.server.server_port)
+        configure_session()
+
+    def tearDown(self):
+        """Stop the server and drop pooled connections."""
+        configure_session()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_yields_requested_fields(self):
+        """Records hold only the requested fields; links are parsed."""
+        records, links = get_json_stream(
+            self.url, fields=[("name",), ("license", "key")])
+        self.assertEqual(links, {"next": "/repos?page=2"})
+        records = list(records)
+        self.assertEqual(len(records), 20000)
+        self.assertEqual(records[:2], [("repo0", None), ("repo1", "mit")])
+
+    def test_memory_stays_bounded(self):
+        """Peak memory is a small fraction of the body, unlike get_json."""
+        size = len(self.handler.body)
+        tracemalloc.start()
+        try:
+            records, _ = get_json_stream(self.url, fields=[("name",)])
+            count = sum(1 for _ in records)
+            _, streamed_peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            utils.get_json(self.url)
+            _, buffered_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(count, 20000)
+        self.assertLess(streamed_peak, size / 10)
+        self.assertGreater(buffered_peak, size)
 
 
 class TestMemoize(unittest.TestCase):
@@ -83,5 +425,71 @@ class TestMemoize(unittest.TestCase):
             mock_method.assert_called_once()
 
 
+class TestMemoizeWith(unittest.TestCase):
+    """Tests for the thread-safe, expiring, shared memoize_with."""
+
+    def test_single_flight(self):
+        """Concurrent first accesses run the method only once."""
+        calls = []
+
+        class TestClass:
+            @memoize_with()
+            def a_property(self):
+                calls.append(1)
+                time.sleep(0.05)
+                return 42
+
+        obj = TestClass()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            obj.a_property)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_ttl_and_invalidate(self):
+        """Values expire after ttl and can be dropped explicitly."""
+        counter = iter(range(100))
+
+        class TestClass:
+            @memoize_with(ttl=0.05)
+            def a_property(self):
+                return next(counter)
+
+        obj = TestClass()
+        self.assertEqual((obj.a_property, obj.a_property), (0, 0))
+        time.sleep(0.06)
+        self.assertEqual(obj.a_property, 1)
+        TestClass.a_property.invalidate(obj)
+        self.assertEqual(obj.a_property, 2)
+
+    def test_shared_by_key_with_lru(self):
+        """Instances with equal keys share a value; LRU bounds the cache."""
+        calls = []
+
+        class TestClass:
+            def __init__(self, name):
+                self.name = name
+
+            @memoize_with(key=lambda self: self.name, maxsize=2)
+            def a_property(self):
+                calls.append(self.name)
+                return self.name.upper()
+
+        self.assertEqual(TestClass("a").a_property, "A")
+        self.assertEqual(TestClass("a").a_property, "A")
+        self.assertEqual(calls, ["a"])
+        TestClass("b").a_property
+        TestClass("c").a_property  # evicts "a", the least recently used
+        TestClass("a").a_property
+        self.assertEqual(calls, ["a", "b", "c", "a"])
+        TestClass.a_property.invalidate()
+        TestClass("c").a_property
+        self.assertEqual(calls, ["a", "b", "c", "a", "c"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,22 +1,62 @@
 #!/usr/bin/env python3
 """Generic utilities for github org client.
 """
+import os
+import json
+import time
+import codecs
+import hashlib
+import tempfile
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import parse_header_links
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
 from functools import wraps
 from typing import (
     Mapping,
     Sequence,
+    Iterable,
+    Iterator,
+    List,
     Any,
     Dict,
     Callable,
+    Hashable,
+    Optional,
+    Tuple,
 )
 
 __all__ = [
+    "HTTPCache",
+    "RateLimiter",
     "access_nested_map",
+    "compile_path",
+    "configure_http_cache",
+    "configure_session",
+    "extract_paths",
     "get_json",
+    "get_json_page",
+    "get_json_stream",
+    "get_session",
+    "iter_json_array",
     "memoize",
+    "memoize_with",
 ]
 
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT: Tuple[float, float] = (3.05, 10)
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.RLock()
+_http_cache: Optional["HTTPCache"] = None
+_MISSING = object()
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
 
 def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     """Access nested map with key path.
@@ -40,11 +80,412 @@ def access_nested_map(nested_map: Mapping, path: Sequence) -> Any:
     return nested_map
 
 
-def get_json(url: str) -> Dict:
+def compile_path(path: Sequence, default: Any = _MISSING
+                 ) -> Callable[[Mapping], Any]:
+    """Compile a key path into a getter, for reading it from many maps.
+    Parameters
+    ----------
+    path: Sequence
+        a sequence of key representing a path to the value
+    default: Any
+        returned when the path is missing; if omitted the getter raises
+        KeyError exactly like access_nested_map
+    Example
+    -------
+    >>> license_key = compile_path(("license", "key"))
+    >>> license_key({"license": {"key": "mit"}})
+    'mit'
+    """
+    keys = tuple(path)
+    for key in keys:
+        hash(key)  # unhashable keys fail here, not on every record
+
+    def getter(nested_map: Mapping) -> Any:
+        for key in keys:
+            # type() is cheap; the Mapping ABC check only runs for non-dicts
+            if type(nested_map) is not dict and \
+                    not isinstance(nested_map, Mapping):
+                if default is _MISSING:
+                    raise KeyError(key)
+                return default
+            try:
+                nested_map = nested_map[key]
+            except KeyError:
+                if default is _MISSING:
+                    raise
+                return default
+        return nested_map
+
+    return getter
+
+
+def extract_paths(records: Iterable[Mapping], paths: Sequence[Sequence],
+                  default: Any = _MISSING) -> List[Tuple]:
+    """Read several key paths from every record in one pass.
+    Parameters
+    ----------
+    records: Iterable[Mapping]
+        nested maps, e.g. a repos payload
+    paths: Sequence[Sequence]
+        the key paths to read from each record
+    default: Any
+        value for missing paths; if omitted KeyError is raised
+    Example
+    -------
+    >>> repos = [{"name": "a", "license": {"key": "mit"}}]
+    >>> extract_paths(repos, [("name",), ("license", "key")])
+    [('a', 'mit')]
+    """
+    getters = [compile_path(path, default) for path in paths]
+    return [tuple([getter(record) for getter in getters])
+            for record in records]
+
+
+def configure_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """(Re)create the shared HTTP session used by get_json.
+    Parameters
+    ----------
+    pool_size: int
+        keep-alive connections kept per host (and hosts kept)
+    """
+    global _session
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    with _session_lock:
+        old, _session = _session, session
+    if old is not None:
+        old.close()
+    return session
+
+
+def get_session() -> requests.Session:
+    """Return the shared keep-alive session, creating it on first use.
+    """
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                configure_session()
+    return _session
+
+
+class HTTPCache:
+    """On-disk cache of JSON bodies with their ETag / Last-Modified.
+    One file per URL, so entries survive across processes.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Init method of HTTPCache"""
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        """File holding the entry for url"""
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.directory, digest + ".json")
+
+    def load(self, url: str) -> Optional[Dict]:
+        """Return the stored entry for url, or None"""
+        try:
+            with open(self._path(url), encoding="utf-8") as cached:
+                return json.load(cached)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, url: str, etag: Optional[str],
+              last_modified: Optional[str], body: Any,
+              links: Optional[Dict[str, str]] = None) -> None:
+        """Atomically write the entry for url"""
+        entry = {"url": url, "etag": etag, "last_modified": last_modified,
+                 "body": body, "links": links or {}}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            json.dump(entry, tmp)
+        os.replace(tmp_path, self._path(url))
+
+
+def configure_http_cache(directory: Optional[str]) -> Optional[HTTPCache]:
+    """Persist get_json responses under directory (None disables).
+    """
+    global _http_cache
+    _http_cache = HTTPCache(directory) if directory else None
+    return _http_cache
+
+
+def _parse_links(header: Optional[str]) -> Dict[str, str]:
+    """Map rel -> url for an HTTP Link header"""
+    if not header:
+        return {}
+    return {link["rel"]: link["url"]
+            for link in parse_header_links(header) if "rel" in link}
+
+
+def get_json_page(url: str, params: Optional[Dict] = None,
+                  timeout: Tuple[float, float] = DEFAULT_TIMEOUT
+                  ) -> Tuple[Any, Dict[str, str]]:
+    """Get JSON from remote URL along with its pagination links.
+    Returns (body, links) where links maps rel ("next", "last", ...) to
+    the URL from the Link header.
+    Reuses pooled keep-alive connections (no new TCP/TLS handshake per
+    call), asks for gzip and gives up after the (connect, read) timeout.
+    With configure_http_cache(), cached bodies are revalidated with
+    If-None-Match / If-Modified-Since and a 304 is served from disk.
+    """
+    kwargs: Dict[str, Any] = {"timeout": timeout}
+    if params:
+        kwargs["params"] = params
+    cache = _http_cache
+    cache_key = url if not params else "{}?{}".format(
+        url, sorted(params.items()))
+    entry = cache.load(cache_key) if cache is not None else None
+    headers = {}
+    if entry is not None:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    if headers:
+        kwargs["headers"] = headers
+    response = get_session().get(url, **kwargs)
+    if entry is not None and headers and response.status_code == 304:
+        return entry["body"], entry.get("links") or {}
+    body = response.json()
+    links = _parse_links(response.headers.get("Link"))
+    if cache is not None and response.status_code == 200:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            cache.store(cache_key, etag, last_modified, body, links)
+    return body, links
+
+
+def get_json(url: str,
+             timeout: Tuple[float, float] = DEFAULT_TIMEOUT) -> Dict:
     """Get JSON from remote URL.
+    See get_json_page for pooling, timeouts and the optional disk cache.
+    """
+    return get_json_page(url, timeout=timeout)[0]
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Shares an API rate limit between threads.
+    Every response's X-RateLimit-Remaining / X-RateLimit-Reset is fed
+    back through release(); acquire() lets a request start only while
+    the window has budget left beyond the requests already in flight
+    and `reserve`, otherwise it waits for the reset. Until a response of
+    the current window reports the budget, one request at a time probes
+    it. Retry-After, or a 403/429 with no budget left, blocks every
+    thread until that time.
+    Example
+    -------
+    >>> limiter = RateLimiter()
+    >>> limiter.acquire()
+    >>> response = get_session().get(url)
+    >>> if limiter.release(response.status_code, response.headers):
+    ...     pass  # rate limited: retry later
+    """
+
+    def __init__(self, reserve: int = 0) -> None:
+        """Init method of RateLimiter"""
+        self.reserve = reserve
+        self.remaining: Optional[int] = None
+        self.reset = 0.0
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.metered = True
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        """Wait until a request may be sent and count it as in flight"""
+        with self._cond:
+            while True:
+                now = time.time()
+                if now < self.blocked_until:
+                    self._cond.wait(self.blocked_until - now)
+                    continue
+                if self.remaining is not None and now >= self.reset:
+                    self.remaining = None  # a new window has started
+                if not self.metered:
+                    break
+                if self.remaining is None:
+                    if self.in_flight == 0:
+                        break
+                    self._cond.wait()
+                elif self.remaining - self.in_flight > self.reserve:
+                    break
+                else:
+                    self._cond.wait(max(0.001, self.reset - now))
+            self.in_flight += 1
+
+    def cancel(self) -> None:
+        """Give back an acquired slot that was not used for a response"""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def release(self, status: int, headers: Mapping[str, str]) -> bool:
+        """Record a response; True if it was rate limited and should be
+        retried once acquire() lets it through again.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            limited = False
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset = headers.get("X-RateLimit-Reset")
+            if remaining is not None and reset is not None:
+                remaining, reset = int(remaining), float(reset)
+                if self.remaining is None or reset > self.reset:
+                    self.remaining, self.reset = remaining, reset
+                elif reset == self.reset:
+                    self.remaining = min(self.remaining, remaining)
+            elif self.remaining is None and status < 400:
+                self.metered = False  # the API does not report a limit
+            delay = _retry_after(headers.get("Retry-After"))
+            if delay is not None and status in (403, 429, 503):
+                self.blocked_until = max(self.blocked_until,
+                                         time.time() + delay)
+                limited = True
+            elif status in (403, 429) and remaining == 0:
+                self.blocked_until = max(self.blocked_until, self.reset)
+                limited = True
+            self._cond.notify_all()
+            return limited
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Decode a top-level JSON array from byte chunks, element by element.
+    Only the element being decoded (plus one chunk) is held in memory,
+    so a huge array is never buffered whole. Malformed input raises
+    json.JSONDecodeError like json.loads.
+    Example
+    -------
+    >>> list(iter_json_array([b'[{"a": 1}, {"a"', b': 2}]']))
+    [{'a': 1}, {'a': 2}]
+    """
+    decode = codecs.getincrementaldecoder("utf-8")().decode
+    chunks = iter(chunks)
+    buffer, pos, eof = "", 0, False
+    state = "start"  # then "first", "value", "separator" and "end"
+    need_more = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        if need_more or pos == len(buffer):
+            if eof:
+                if state == "end" and pos == len(buffer):
+                    return
+                # a partial element left at the end fails to decode below
+                if pos == len(buffer):
+                    raise json.JSONDecodeError(
+                        "Unterminated array", buffer, pos)
+            else:
+                # Read at least as much as is pending, so a large element
+                # is retried a logarithmic number of times, not per chunk
+                pending = buffer[pos:]
+                parts = [pending]
+                added = 0
+                while added <= len(pending):
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        eof = True
+                        parts.append(decode(b"", final=True))
+                        break
+                    text = decode(chunk)
+                    parts.append(text)
+                    added += len(text)
+                buffer, pos, need_more = "".join(parts), 0, False
+                continue
+        char = buffer[pos]
+        if state == "end":
+            raise json.JSONDecodeError("Extra data", buffer, pos)
+        if state == "start":
+            if char != "[":
+                raise json.JSONDecodeError("Expecting '['", buffer, pos)
+            pos, state = pos + 1, "first"
+        elif state == "separator":
+            if char == "]":
+                pos, state = pos + 1, "end"
+            elif char != ",":
+                raise json.JSONDecodeError(
+                    "Expecting ',' delimiter", buffer, pos)
+            else:
+                pos, state = pos + 1, "value"
+        elif state == "first" and char == "]":
+            pos, state = pos + 1, "end"
+        else:
+            try:
+                value, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                need_more = True
+                continue
+            after = end
+            while after < len(buffer) and buffer[after] in _WHITESPACE:
+                after += 1
+            if not eof and (after == len(buffer)
+                            or buffer[after] not in ",]"):
+                # "12" may be the start of "123" and "1." of "1.5": only
+                # a delimiter proves the element is complete
+                need_more = True
+                continue
+            pos, state = end, "separator"
+            yield value
+
+
+def get_json_stream(url: str, fields: Optional[Sequence[Sequence]] = None,
+                    params: Optional[Dict] = None,
+                    timeout: Tuple[float, float] = DEFAULT_TIMEOUT,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE
+                    ) -> Tuple[Iterator[Any], Dict[str, str]]:
+    """Stream a JSON array from remote URL along with its pagination links.
+    Returns (records, links) like get_json_page, but records is an
+    iterator decoding the body as it arrives. With fields (key paths),
+    each record is a tuple of just those values (None when missing), so
+    memory stays bounded however many elements the array has.
+    Bypasses the disk cache, which would need the whole body.
+    Example
+    -------
+    >>> records, links = get_json_stream(
+    ...     repos_url, fields=[("name",), ("license", "key")])
+    >>> next(records)
+    ('repo1', 'mit')
     """
-    response = requests.get(url)
-    return response.json()
+    kwargs: Dict[str, Any] = {"timeout": timeout, "stream": True}
+    if params:
+        kwargs["params"] = params
+    response = get_session().get(url, **kwargs)
+    links = _parse_links(response.headers.get("Link"))
+
+    def records() -> Iterator[Any]:
+        try:
+            elements = iter_json_array(response.iter_content(chunk_size))
+            if fields is None:
+                yield from elements
+                return
+            getters = [compile_path(path, default=None) for path in fields]
+            for element in elements:
+                yield tuple([getter(element) for getter in getters])
+        finally:
+            response.close()
+
+    return records(), links
 
 
 def memoize(fn: Callable) -> Callable:
@@ -73,3 +514,120 @@ def memoize(fn: Callable) -> Callable:
         return getattr(self, attr_name)
 
     return property(memoized)
+
+
+class MemoizedProperty:
+    """Property computing its value once per instance (or per shared key).
+    See memoize_with.
+    """
+
+    def __init__(self, fn: Callable, ttl: Optional[float] = None,
+                 key: Optional[Callable[[Any], Hashable]] = None,
+                 maxsize: int = 128) -> None:
+        """Init method of MemoizedProperty"""
+        self.fn = fn
+        self.ttl = ttl
+        self.key = key
+        self.maxsize = maxsize
+        self.attr_name = "_{}".format(fn.__name__)
+        self.__doc__ = fn.__doc__
+        self._lock = threading.Lock()
+        self._shared: "OrderedDict[Hashable, Tuple[Any, float]]" = \
+            OrderedDict()
+        self._flights: Dict[Any, threading.Lock] = {}
+
+    def _expires(self) -> float:
+        """Expiry timestamp for a value computed now"""
+        if self.ttl is None:
+            return float("inf")
+        return time.monotonic() + self.ttl
+
+    def _lookup(self, obj: Any, key: Any) -> Any:
+        """Cached value for obj/key, or _MISSING if absent or expired"""
+        with self._lock:
+            if self.key is None:
+                entry = obj.__dict__.get(self.attr_name)
+            else:
+                entry = self._shared.get(key)
+                if entry is not None:
+                    self._shared.move_to_end(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return _MISSING
+        return entry[0]
+
+    def _store(self, obj: Any, key: Any, value: Any) -> None:
+        """Remember value for obj/key, evicting the LRU shared entry"""
+        entry = (value, self._expires())
+        with self._lock:
+            if self.key is None:
+                obj.__dict__[self.attr_name] = entry
+                return
+            self._shared[key] = entry
+            self._shared.move_to_end(key)
+            while len(self._shared) > self.maxsize:
+                self._shared.popitem(last=False)
+
+    def __get__(self, obj: Any, objtype: Any = None) -> Any:
+        """Return the cached value, computing it at most once at a time"""
+        if obj is None:
+            return self
+        key = self.key(obj) if self.key is not None else None
+        value = self._lookup(obj, key)
+        if value is not _MISSING:
+            return value
+        flight_id = id(obj) if self.key is None else ("key", key)
+        with self._lock:
+            flight = self._flights.setdefault(flight_id, threading.Lock())
+        with flight:
+            # Another thread may have filled the cache while we waited
+            value = self._lookup(obj, key)
+            if value is _MISSING:
+                value = self.fn(obj)
+                self._store(obj, key, value)
+        with self._lock:
+            if self._flights.get(flight_id) is flight:
+                del self._flights[flight_id]
+        return value
+
+    def invalidate(self, obj: Any = None) -> None:
+        """Forget the value of obj, or every shared value if obj is None"""
+        with self._lock:
+            if obj is None:
+                self._shared.clear()
+            elif self.key is None:
+                obj.__dict__.pop(self.attr_name, None)
+            else:
+                self._shared.pop(self.key(obj), None)
+
+
+def memoize_with(ttl: Optional[float] = None,
+                 key: Optional[Callable[[Any], Hashable]] = None,
+                 maxsize: int = 128) -> Callable[[Callable], MemoizedProperty]:
+    """Thread-safe, optionally expiring and shared variant of memoize.
+    Parameters
+    ----------
+    ttl: float
+        seconds a value stays valid (None: forever)
+    key: Callable
+        share values between instances with the same key(instance),
+        e.g. the constructor arguments; None keeps one value per instance
+    maxsize: int
+        shared values kept, least recently used evicted first
+    Concurrent first accesses run the method once; the others wait for it.
+    Example
+    -------
+    class Client:
+        def __init__(self, org):
+            self.org_name = org
+
+        @memoize_with(ttl=300, key=lambda self: self.org_name)
+        def org(self):
+            return fetch(self.org_name)
+    >>> Client("google").org is Client("google").org
+    True
+    >>> Client.org.invalidate()
+    """
+    def decorator(fn: Callable) -> MemoizedProperty:
+        return MemoizedProperty(fn, ttl=ttl, key=key, maxsize=maxsize)
+
+    return decorator
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+0-bench_profiles.py
+
+Benchmarks every DatabaseConnection profile against the default settings.
+Each profile gets a fresh scratch database and runs:
+- write: single-row INSERT + commit per transaction, then one bulk load
+- read:  random point lookups by id, then full-table aggregate scans
+Usage:
+    python3 0-bench_profiles.py [rows]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+databaseconnection = __import__('0-databaseconnection')
+DatabaseConnection = databaseconnection.DatabaseConnection
+PROFILES = databaseconnection.PROFILES
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def _bench_profile(path, profile, rows, commits, lookups, scans):
+    with DatabaseConnection(path, profile=profile) as conn:
+        conn.execute(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+            "email TEXT, age INTEGER)"
+        )
+
+        def small_commits():
+            for i in range(commits):
+                conn.execute(
+                    "INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+                    (f"user{i}", f"user{i}@example.com", i % 90),
+                )
+                conn.commit()
+
+        def bulk_load():
+            conn.executemany(
+                "INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+                ((f"user{i}", f"user{i}@example.com", i % 90)
+                 for i in range(rows)),
+            )
+            conn.commit()
+
+        write_commits = _timed(small_commits)
+        write_bulk = _timed(bulk_load)
+
+    # Reads use a fresh connection, as a new request would
+    with DatabaseConnection(path, profile=profile) as conn:
+        total = rows + commits
+
+        def point_lookups():
+            for _ in range(lookups):
+                conn.execute("SELECT * FROM users WHERE id = ?",
+                             (random.randint(1, total),)).fetchone()
+
+        def full_scans():
+            for _ in range(scans):
+                conn.execute(
+                    "SELECT age, COUNT(*) FROM users GROUP BY age"
+                ).fetchall()
+
+        read_points = _timed(point_lookups)
+        read_scans = _timed(full_scans)
+
+    return {
+        "commits/s": commits / write_commits,
+        "bulk rows/s": rows / write_bulk,
+        "lookups/s": lookups / read_points,
+        "scans/s": scans / read_scans,
+    }
+
+
+def main(rows=200000, commits=500, lookups=20000, scans=10):
+    print(f"{'profile':<12} {'commits/s':>10} {'bulk rows/s':>12} "
+          f"{'lookups/s':>10} {'scans/s':>8}")
+    with tempfile.TemporaryDirectory() as scratch:
+        for profile in PROFILES:
+            path = os.path.join(scratch, f"{profile}.db")
+            result = _bench_profile(path, profile, rows, commits,
+                                    lookups, scans)
+            print(f"{profile:<12} {result['commits/s']:>10,.0f} "
+                  f"{result['bulk rows/s']:>12,.0f} "
+                  f"{result['lookups/s']:>10,.0f} "
+                  f"{result['scans/s']:>8,.1f}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -9,25 +9,84 @@ Usage:
         cursor.execute("SELECT * FROM users")
         rows = cursor.fetchall()
         ...
+
+    with DatabaseConnection("users.db", profile="read_heavy") as conn:
+        ...
 """
 
 import sqlite3
 import os
 
+# Named PRAGMA sets applied when the connection is opened.
+# - read_heavy: WAL so readers never wait on writers, big page cache, mmap
+# - write_heavy: WAL + synchronous=NORMAL (one fsync per checkpoint,
+#   not per commit; still crash-safe in WAL mode)
+# - bulk_load: no durability until the load finishes; only for data that
+#   can be rebuilt if the process crashes mid-load
+PROFILES = {
+    "default": {},
+    "read_heavy": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,  # negative = KiB, i.e. ~64 MB
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+    "write_heavy": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,
+        "temp_store": "MEMORY",
+        "wal_autocheckpoint": 10000,
+    },
+    "bulk_load": {
+        "journal_mode": "MEMORY",
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "temp_store": "MEMORY",
+    },
+}
+
+
+def apply_profile(conn, profile):
+    """Apply a profile (name from PROFILES or a dict of PRAGMAs) to conn."""
+    pragmas = PROFILES[profile] if isinstance(profile, str) else profile
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
 
 class DatabaseConnection:
-    """Context manager that opens a sqlite3 connection and closes it on exit."""
+    """
+    Context manager that opens a sqlite3 connection and closes it on exit.
+    The same instance can be entered again while already open (nested or
+    reentrant use): it hands back the same tuned connection and only closes
+    it when the outermost block exits.
+    """
 
-    def __init__(self, db_path="users.db"):
+    def __init__(self, db_path="users.db", profile="default"):
         self.db_path = db_path
+        self.profile = profile
         self.conn = None
+        self._depth = 0
 
     def __enter__(self):
         # Open and return the connection (caller can get cursor from it)
-        self.conn = sqlite3.connect(self.db_path)
+        if self._depth == 0:
+            self.conn = sqlite3.connect(self.db_path)
+            try:
+                apply_profile(self.conn, self.profile)
+            except Exception:
+                self.conn.close()
+                self.conn = None
+                raise
+        self._depth += 1
         return self.conn
 
     def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth > 0:
+            return False
         # Ensure the connection is closed no matter what happened
         try:
             if self.conn:
@@ -35,6 +94,7 @@ class DatabaseConnection:
         except Exception:
             # In a real app you might log this
             pass
+        self.conn = None
         # Returning False lets any exception propagate to the caller
         return False
 
@@ -7,19 +7,41 @@ Reusable class-based context manager that:
 - Executes a query with parameters
 - Returns the result set on __enter__
 - Ensures cleanup on __exit__
+- Optionally interrupts the query once `timeout` seconds have passed
+- Optionally streams rows (stream=True) instead of materializing them
+
+ExecuteBatch runs several named queries over one connection inside one
+transaction, so related queries share a consistent snapshot.
 """
 
 import sqlite3
 import os
+import time
+from collections import namedtuple
+
+query_metrics = {"timeouts": 0}
+
+
+class QueryTimeoutError(sqlite3.OperationalError):
+    """Raised when a query was interrupted because its deadline passed."""
 
 
 class ExecuteQuery:
     """Context manager to execute a SQL query with given parameters."""
 
-    def __init__(self, db_path, query, params=None):
+    # SQLite VM instructions between two deadline checks
+    PROGRESS_STEPS = 1000
+
+    def __init__(self, db_path, query, params=None, timeout=None,
+                 stream=False, fetch_size=500):
         self.db_path = db_path
         self.query = query
         self.params = params or ()
+        self.timeout = timeout
+        # stream=True: __enter__ returns a row iterator that fetches
+        # `fetch_size` rows at a time; rows are only valid inside the block
+        self.stream = stream
+        self.fetch_size = fetch_size
         self.conn = None
         self.cursor = None
         self.results = None
@@ -27,14 +49,59 @@ class ExecuteQuery:
     def __enter__(self):
         # Open connection and execute query
         self.conn = sqlite3.connect(self.db_path)
+        if self.timeout is not None:
+            # The progress handler aborts the running statement itself,
+            # so a runaway query cannot hold the worker past its deadline
+            deadline = time.monotonic() + self.timeout
+            self.conn.set_progress_handler(
+                lambda: time.monotonic() >= deadline, self.PROGRESS_STEPS
+            )
         self.cursor = self.conn.cursor()
-        self.cursor.execute(self.query, self.params)
-        self.results = self.cursor.fetchall()
+        self.cursor.arraysize = self.fetch_size
+        try:
+            self.cursor.execute(self.query, self.params)
+            if self.stream:
+                self.results = self._iter_rows()
+            else:
+                self.results = self.cursor.fetchall()
+        except Exception as e:
+            # __exit__ is not called when __enter__ raises: clean up here
+            self.__exit__(type(e), e, e.__traceback__)
+            timeout_error = self._timeout_error(e)
+            if timeout_error is None:
+                raise
+            raise timeout_error from e
         return self.results
 
+    def _timeout_error(self, exc):
+        """QueryTimeoutError for a statement interrupted by the deadline."""
+        if (self.timeout is None
+                or not isinstance(exc, sqlite3.OperationalError)
+                or "interrupted" not in str(exc)):
+            return None
+        query_metrics["timeouts"] += 1
+        return QueryTimeoutError(
+            f"query exceeded {self.timeout}s: {self.query}")
+
+    def _iter_rows(self):
+        """Yield rows batch by batch so memory stays constant."""
+        while True:
+            try:
+                rows = self.cursor.fetchmany()
+            except sqlite3.OperationalError as e:
+                timeout_error = self._timeout_error(e)
+                if timeout_error is None:
+                    raise
+                raise timeout_error from e
+            if not rows:
+                return
+            yield from rows
+
     def __exit__(self, exc_type, exc_value, traceback):
         # Cleanup
         try:
+            if self.stream and self.results is not None:
+                self.results.close()  # drop rows fetched but not consumed
             if self.cursor:
                 self.cursor.close()
             if self.conn:
@@ -44,6 +111,94 @@ class ExecuteQuery:
         return False  # propagate any exception
 
 
+# Batch entry that runs `query` once per parameter tuple in `rows`
+Many = namedtuple("Many", ["query", "rows"])
+
+# Authorizer actions that read-only statements are compiled with
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ,
+                 sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+
+class ExecuteBatch:
+    """
+    Context manager running named queries in one connection and transaction.
+    `queries` maps a name to either (query, params) or Many(query, rows).
+    __enter__ returns {name: rows} for SELECTs and {name: rowcount} for
+    writes. Read-only batches use a deferred BEGIN (one consistent
+    snapshot); batches with writes, whether Many entries or plain
+    INSERT/UPDATE/DELETE entries, take the write lock up front with
+    BEGIN IMMEDIATE. Everything is committed together, or rolled back if
+    any entry fails.
+    """
+
+    def __init__(self, db_path, queries):
+        self.db_path = db_path
+        self.queries = queries
+        self.conn = None
+        self.results = None
+
+    def __enter__(self):
+        self.conn = sqlite3.connect(self.db_path, isolation_level=None)
+        cursor = self.conn.cursor()
+        try:
+            writes = self._writes(cursor)
+            cursor.execute("BEGIN IMMEDIATE" if writes else "BEGIN")
+            self.results = {}
+            for name, entry in self.queries.items():
+                if isinstance(entry, Many):
+                    cursor.executemany(entry.query, entry.rows)
+                else:
+                    query, params = entry
+                    cursor.execute(query, params or ())
+                if cursor.description is not None:
+                    self.results[name] = cursor.fetchall()
+                else:
+                    self.results[name] = cursor.rowcount
+            cursor.execute("COMMIT")
+        except Exception:
+            # __exit__ is not called when __enter__ raises: clean up here
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            cursor.close()
+            self.conn.close()
+            self.conn = None
+            raise
+        cursor.close()
+        return self.results
+
+    def _writes(self, cursor):
+        """
+        True if any entry may write. Many entries always do; plain ones
+        are compiled with EXPLAIN (not run) while an authorizer watches
+        for anything a read-only statement would not need.
+        """
+        if any(isinstance(entry, Many) for entry in self.queries.values()):
+            return True
+        actions = set()
+
+        def authorizer(action, *args):
+            actions.add(action)
+            return sqlite3.SQLITE_OK
+
+        self.conn.set_authorizer(authorizer)
+        try:
+            for query, params in self.queries.values():
+                cursor.execute("EXPLAIN " + query, params or ())
+                if not actions <= _READ_ACTIONS:
+                    return True
+        finally:
+            self.conn.set_authorizer(None)
+        return False
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if self.conn:
+                self.conn.close()
+        except Exception:
+            pass
+        return False
+
+
 def _seed_example_db(path="users.db"):
     """Create a small users table with 'age' if not exists."""
     if os.path.exists(path):
@@ -75,3 +230,16 @@ if __name__ == "__main__":
         print("Users older than 25:")
         for row in results:
             print(row)
+
+    with ExecuteQuery("users.db", query, params, stream=True,
+                      fetch_size=100) as rows:
+        print("First user older than 25 (streamed):")
+        print(next(rows, None))
+
+    dashboard = {
+        "total": ("SELECT COUNT(*) FROM users", None),
+        "average_age": ("SELECT AVG(age) FROM users", None),
+        "older": (query, params),
+    }
+    with ExecuteBatch("users.db", dashboard) as results:
+        print("Dashboard:", results)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+3-bench_pool.py
+
+Runs many small concurrent point queries two ways:
+- one aiosqlite.connect per query (one new thread per query)
+- AsyncConnectionPool (bounded number of warm connections/threads)
+and reports wall time plus the peak number of live threads.
+Usage:
+    python3 3-bench_pool.py [queries] [pool_size]
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import sqlite3
+import tempfile
+import threading
+
+import aiosqlite
+
+AsyncConnectionPool = __import__('3-concurrent').AsyncConnectionPool
+
+
+async def _watch_threads(peak, stop):
+    while not stop.is_set():
+        peak[0] = max(peak[0], threading.active_count())
+        await asyncio.sleep(0.001)
+
+
+async def _run(label, queries, lookup):
+    peak, stop = [threading.active_count()], asyncio.Event()
+    watcher = asyncio.create_task(_watch_threads(peak, stop))
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(lookup(random.randint(1, 1000)) for _ in range(queries))
+    )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await watcher
+    print(f"{label:<22} {queries} queries in {elapsed:.2f}s "
+          f"({queries / elapsed:,.0f} q/s), peak threads={peak[0]}")
+
+
+async def main(queries=800, pool_size=8):
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "users.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.executemany("INSERT INTO users VALUES (?, ?)",
+                         [(i, f"user{i}") for i in range(1, 1001)])
+        conn.commit()
+        conn.close()
+
+        query = "SELECT * FROM users WHERE id = ?"
+
+        async def connect_per_query(user_id):
+            async with aiosqlite.connect(path) as db:
+                return await db.execute_fetchall(query, (user_id,))
+
+        await _run("connect per query", queries, connect_per_query)
+
+        async with AsyncConnectionPool(path, max_size=pool_size) as pool:
+            async def pooled(user_id):
+                return await pool.fetchall(query, (user_id,), timeout=5)
+
+            await _run(f"pool (max_size={pool_size})", queries, pooled)
+            # Second batch reuses the warm connections from the first
+            await _run("pool, warm", queries, pooled)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:3])))
@@ -2,37 +2,178 @@
 """
 Task 2: Concurrent Asynchronous Database Queries
 Objective: Run multiple database queries concurrently using asyncio.gather.
+
+AsyncConnectionPool keeps up to `max_size` warm aiosqlite connections (one
+thread each) and bounds the fan-out with a semaphore, so hundreds of
+gathered queries share a handful of threads instead of spawning one each.
+
+fetch_as_completed yields each query's rows as soon as that query finishes,
+so the first result arrives as fast as the fastest query; stream_rows
+streams a single query row by row with `async for`.
 """
 
+import time
 import asyncio
+import contextlib
+from collections import namedtuple
 import aiosqlite
 
+# rows is None and timed_out is True for queries cancelled at the deadline
+QueryResult = namedtuple("QueryResult", ["name", "rows", "timed_out"])
+
+
+class AsyncConnectionPool:
+    """Bounded pool of reusable aiosqlite connections."""
+
+    def __init__(self, db_name="users.db", max_size=8):
+        self.db_name = db_name
+        self.max_size = max_size
+        self._idle = []
+        self._all = []
+        self._semaphore = asyncio.Semaphore(max_size)
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        """Borrow a connection; waits while all `max_size` are in use."""
+        async with self._semaphore:
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = await aiosqlite.connect(self.db_name)
+                self._all.append(conn)
+            try:
+                yield conn
+            finally:
+                self._idle.append(conn)
+
+    async def fetchall(self, query, params=(), timeout=None):
+        """
+        Run a query on a pooled connection. With `timeout`, the statement is
+        interrupted inside SQLite (not just abandoned) and TimeoutError is
+        raised, leaving the connection usable for the next caller.
+        """
+        async with self.connection() as conn:
+            try:
+                return await asyncio.wait_for(
+                    conn.execute_fetchall(query, params), timeout
+                )
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # Stop the statement too, or it keeps the connection busy
+                await conn.interrupt()
+                raise
+
+    async def close(self):
+        for conn in self._all:
+            await conn.close()
+        self._idle.clear()
+        self._all.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
+
+
+async def _fetch(query, params, db_name, pool):
+    if pool is not None:
+        return await pool.fetchall(query, params)
+    async with aiosqlite.connect(db_name) as db:
+        try:
+            return await db.execute_fetchall(query, params)
+        except asyncio.CancelledError:
+            await db.interrupt()
+            raise
+
+
+async def fetch_as_completed(queries, deadline=None, db_name="users.db",
+                             pool=None):
+    """
+    Run named queries concurrently and yield a QueryResult for each one as
+    soon as it finishes. `queries` maps name -> (query, params). Queries
+    still running `deadline` seconds after the start are cancelled (and
+    interrupted inside SQLite) and yielded with timed_out=True.
+    """
+    tasks = {
+        asyncio.ensure_future(_fetch(query, params, db_name, pool)): name
+        for name, (query, params) in queries.items()
+    }
+    started = time.monotonic()
+    pending = set(tasks)
+    try:
+        while pending:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0, deadline - (time.monotonic() - started))
+            done, pending = await asyncio.wait(
+                pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for task in done:
+                yield QueryResult(tasks[task], task.result(), False)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        for task in pending:
+            yield QueryResult(tasks[task], None, True)
+    finally:
+        # Consumer stopped early or a query failed: do not leak tasks
+        for task in tasks:
+            task.cancel()
+
+
+async def stream_rows(query, params=(), db_name="users.db", pool=None,
+                      chunk_size=256):
+    """Yield rows of one query with `async for`, `chunk_size` per fetch."""
+    if pool is not None:
+        async with pool.connection() as conn:
+            async with conn.execute(query, params) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        return
+                    for row in rows:
+                        yield row
+    async with aiosqlite.connect(db_name, iter_chunk_size=chunk_size) as db:
+        async with db.execute(query, params) as cursor:
+            async for row in cursor:
+                yield row
+
 
-async def async_fetch_users(db_name="users.db"):
+async def async_fetch_users(db_name="users.db", pool=None):
+    if pool is not None:
+        return await pool.fetchall("SELECT * FROM users")
     async with aiosqlite.connect(db_name) as db:
         async with db.execute("SELECT * FROM users") as cursor:
             return await cursor.fetchall()
 
 
-async def async_fetch_older_users(db_name="users.db"):
+async def async_fetch_older_users(db_name="users.db", pool=None):
+    if pool is not None:
+        return await pool.fetchall("SELECT * FROM users WHERE age > 40")
     async with aiosqlite.connect(db_name) as db:
         async with db.execute("SELECT * FROM users WHERE age > 40") as cursor:
             return await cursor.fetchall()
 
 
 async def fetch_concurrently():
-    users, older_users = await asyncio.gather(
-        async_fetch_users(),
-        async_fetch_older_users(),
-    )
-
-    print("\nAll Users:")
-    for row in users:
-        print(row)
-
-    print("\nUsers older than 40:")
-    for row in older_users:
-        print(row)
+    queries = {
+        "All Users": ("SELECT * FROM users", ()),
+        "Users older than 40": ("SELECT * FROM users WHERE age > 40", ()),
+    }
+    # Print each result as soon as its query is done, not after the slowest
+    async with AsyncConnectionPool("users.db", max_size=2) as pool:
+        async for result in fetch_as_completed(queries, deadline=5,
+                                               pool=pool):
+            print(f"\n{result.name}:")
+            if result.timed_out:
+                print("(timed out)")
+                continue
+            for row in result.rows:
+                print(row)
 
 
 if __name__ == "__main__":
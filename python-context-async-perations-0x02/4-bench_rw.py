@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+4-bench_rw.py
+
+Read scaling of ReadWriteExecutor: the same batch of aggregate queries is
+run with 1, 2, 4 ... cpu_count reader threads while a steady stream of
+writes goes through the single writer.
+Usage:
+    python3 4-bench_rw.py [rows] [reads]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+
+ReadWriteExecutor = __import__('4-rw_executor').ReadWriteExecutor
+
+QUERY = ("SELECT age, COUNT(*), AVG(LENGTH(email)) FROM users "
+         "WHERE id % ? = 0 GROUP BY age")
+
+
+def _seed(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, "
+                 "email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+                     ((f"user{i}", f"user{i}@example.com", i % 90)
+                      for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def main(rows=200000, reads=64):
+    cpus = os.cpu_count() or 4
+    levels = sorted({1, 2, 4, cpus})
+    with tempfile.TemporaryDirectory() as scratch:
+        path = os.path.join(scratch, "users.db")
+        _seed(path, rows)
+        for readers in levels:
+            with ReadWriteExecutor(path, readers=readers) as db:
+                started = time.perf_counter()
+                results = [db.read(QUERY, (i % 7 + 1,)) for i in range(reads)]
+                writes = [
+                    db.write("UPDATE users SET age = ? WHERE id = ?",
+                             (i % 90, i + 1))
+                    for i in range(reads * 10)
+                ]
+                for future in results:
+                    future.result()
+                read_elapsed = time.perf_counter() - started
+                written = sum(future.result() for future in writes)
+            print(f"readers={readers:<3} {reads / read_elapsed:8.1f} reads/s "
+                  f"({written} concurrent writes committed)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+4-rw_executor.py
+
+Parallel readers with a single writer for SQLite.
+
+ReadWriteExecutor switches the database to WAL mode (readers never block
+on the writer and vice versa), runs reads on a thread pool where every
+thread owns a read-only connection, and funnels all writes through one
+writer thread (a GroupCommitter). Writes queued close together are
+committed in one transaction, each under its own SAVEPOINT so one bad
+write fails alone.
+Usage:
+    with ReadWriteExecutor("users.db", readers=4) as db:
+        rows = db.read("SELECT * FROM users WHERE age > ?", (25,)).result()
+        db.write("UPDATE users SET age = age + 1 WHERE id = ?", (1,)).result()
+"""
+
+import os
+import time
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class GroupCommitter:
+    """
+    Shares one transaction (one commit, one fsync) between many callers.
+    Calls submitted within `window` seconds, up to `max_batch` of them, run
+    on a single background connection inside one BEGIN ... COMMIT. Each call
+    runs under its own SAVEPOINT, so a failing call is rolled back alone and
+    only that caller sees the exception; the others still commit.
+    Submitting after close() starts a new background thread. `pragmas`
+    are run on each new background connection.
+    """
+
+    def __init__(self, db_path="users.db", window=0.005, max_batch=100,
+                 pragmas=()):
+        self.db_path = db_path
+        self.window = window
+        self.max_batch = max_batch
+        self.pragmas = pragmas
+        self.commits = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(conn, *args, **kwargs) and return a Future for it."""
+        future = Future()
+        # Queue under the lock: close() cannot slip its stop marker in
+        # between, which would leave this call to a thread that has exited
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._queue.put((future, func, args, kwargs))
+        return future
+
+    def close(self):
+        """Flush pending calls and stop the background thread."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            for pragma in self.pragmas:
+                conn.execute(pragma)
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        try:
+            # Take the write lock up front: contention fails (or waits) here
+            # once, not inside some caller's savepoint
+            conn.execute("BEGIN IMMEDIATE")
+            for future, func, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT group_call")
+                try:
+                    result = func(conn, *args, **kwargs)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO group_call")
+                    conn.execute("RELEASE group_call")
+                    outcomes.append((future, None, e))
+                else:
+                    conn.execute("RELEASE group_call")
+                    outcomes.append((future, result, None))
+            conn.execute("COMMIT")
+            self.commits += 1
+        except BaseException as e:
+            # The shared transaction itself failed: nobody's work was saved.
+            # Swallowed so the thread keeps serving later calls
+            if conn.in_transaction:
+                conn.rollback()
+            for future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+def _run_write(conn, query, params, many):
+    """Run one queued write; its rowcount is the caller's result."""
+    if many:
+        return conn.executemany(query, params).rowcount
+    return conn.execute(query, params).rowcount
+
+
+class ReadWriteExecutor:
+    """N read-only connections on a thread pool plus one batching writer."""
+
+    def __init__(self, db_path="users.db", readers=None, write_batch=100,
+                 write_window=0.002):
+        self.db_path = db_path
+        self.readers = readers or os.cpu_count() or 4
+        self.write_batch = write_batch
+        self.write_window = write_window
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.close()
+
+        self._local = threading.local()
+        self._reader_conns = []
+        self._reader_lock = threading.Lock()
+        self._read_pool = ThreadPoolExecutor(
+            max_workers=self.readers, thread_name_prefix="sqlite-reader"
+        )
+        self._writer = GroupCommitter(
+            db_path, window=write_window, max_batch=write_batch,
+            pragmas=("PRAGMA synchronous = NORMAL",)
+        )
+        self._closed = False
+        self._write_lock = threading.Lock()
+
+    # Reads
+
+    def _reader_conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True,
+                                   check_same_thread=False)
+            self._local.conn = conn
+            with self._reader_lock:
+                self._reader_conns.append(conn)
+        return conn
+
+    def _read(self, query, params):
+        return self._reader_conn().execute(query, params).fetchall()
+
+    def read(self, query, params=()):
+        """Run a SELECT on a reader thread; returns a Future of the rows."""
+        return self._read_pool.submit(self._read, query, params)
+
+    # Writes
+
+    def write(self, query, params=()):
+        """Queue one write; returns a Future of its rowcount."""
+        return self._queue_write(query, params, False)
+
+    def write_many(self, query, rows):
+        """Queue an executemany write; returns a Future of its rowcount."""
+        return self._queue_write(query, rows, True)
+
+    def _queue_write(self, query, params, many):
+        # Checked and queued under one lock, so a write never lands behind
+        # close() where it would restart the writer thread
+        with self._write_lock:
+            if self._closed:
+                raise RuntimeError("cannot write after close()")
+            return self._writer.submit(_run_write, query, params, many)
+
+    # Lifecycle
+
+    def close(self):
+        """Flush queued writes, then stop the writer and reader threads."""
+        with self._write_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._writer.close()
+        self._read_pool.shutdown(wait=True)
+        with self._reader_lock:
+            for conn in self._reader_conns:
+                conn.close()
+            self._reader_conns.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+if __name__ == "__main__":
+    with ReadWriteExecutor("users.db", readers=4) as db:
+        older = db.read("SELECT * FROM users WHERE age > ?", (25,))
+        bumped = db.write("UPDATE users SET age = age + 0 WHERE id = ?", (1,))
+        print("Users older than 25:", older.result())
+        print("Rows written:", bumped.result())
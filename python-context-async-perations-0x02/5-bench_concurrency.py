@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+5-bench_concurrency.py
+
+Does asyncio.gather over aiosqlite (3-concurrent.py) actually beat running
+the same queries sequentially, on a ThreadPoolExecutor, or on a process
+pool? This harness builds a local users table, runs an identical query mix
+with every strategy at several concurrency levels and prints one JSON
+document with throughput and latency percentiles per run.
+Usage:
+    python3 5-bench_concurrency.py [--rows N] [--queries N]
+                                   [--levels 1,4,16] [--db PATH]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import aiosqlite
+
+# (name, SQL, parameter factory) - a mix of point, range and aggregate reads
+QUERY_MIX = [
+    ("point", "SELECT * FROM users WHERE id = ?",
+     lambda rng, rows: (rng.randint(1, rows),)),
+    ("range", "SELECT id, name FROM users WHERE age BETWEEN ? AND ? LIMIT 100",
+     lambda rng, rows: (lambda a: (a, a + 2))(rng.randint(18, 80))),
+    ("older", "SELECT * FROM users WHERE age > ? LIMIT 50",
+     lambda rng, rows: (rng.randint(18, 90),)),
+    ("aggregate",
+     "SELECT age, COUNT(*) FROM users WHERE id % ? = 0 GROUP BY age",
+     lambda rng, rows: (rng.randint(50, 100),)),
+]
+
+
+def build_db(path, rows):
+    """Create (or reuse) a users table with `rows` rows and an age index."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, "
+                 "name TEXT NOT NULL, email TEXT, age INTEGER)")
+    existing = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    if existing < rows:
+        rng = random.Random(0)
+        conn.executemany(
+            "INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+            ((f"user{i}", f"user{i}@example.com", rng.randint(18, 90))
+             for i in range(existing, rows)),
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_users_age ON users(age)")
+        conn.commit()
+    conn.close()
+
+
+def make_workload(queries, rows, seed=42):
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(queries):
+        _, sql, params = rng.choice(QUERY_MIX)
+        workload.append((sql, params(rng, rows)))
+    return workload
+
+
+def _percentiles(latencies):
+    ordered = sorted(latencies)
+
+    def pct(p):
+        last = len(ordered) - 1
+        index = min(last, int(round(p / 100.0 * last)))
+        return round(ordered[index] * 1000, 3)
+
+    return {"p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99),
+            "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+def _timed_query(conn, sql, params):
+    started = time.perf_counter()
+    conn.execute(sql, params).fetchall()
+    return time.perf_counter() - started
+
+
+# Strategies: each returns the list of per-query latencies
+
+def run_sequential(db_path, workload, concurrency):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [_timed_query(conn, sql, params) for sql, params in workload]
+    finally:
+        conn.close()
+
+
+def _thread_worker(db_path, chunk):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [_timed_query(conn, sql, params) for sql, params in chunk]
+    finally:
+        conn.close()
+
+
+def _split(workload, parts):
+    return [workload[i::parts] for i in range(parts)]
+
+
+def run_threads(db_path, workload, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        chunks = pool.map(_thread_worker, [db_path] * concurrency,
+                          _split(workload, concurrency))
+        return [latency for chunk in chunks for latency in chunk]
+
+
+def run_processes(db_path, workload, concurrency):
+    with ProcessPoolExecutor(max_workers=concurrency) as pool:
+        chunks = pool.map(_thread_worker, [db_path] * concurrency,
+                          _split(workload, concurrency))
+        return [latency for chunk in chunks for latency in chunk]
+
+
+def run_asyncio(db_path, workload, concurrency):
+    async def worker(chunk):
+        latencies = []
+        async with aiosqlite.connect(db_path) as db:
+            for sql, params in chunk:
+                started = time.perf_counter()
+                async with db.execute(sql, params) as cursor:
+                    await cursor.fetchall()
+                latencies.append(time.perf_counter() - started)
+        return latencies
+
+    async def main():
+        chunks = await asyncio.gather(
+            *(worker(chunk) for chunk in _split(workload, concurrency))
+        )
+        return [latency for chunk in chunks for latency in chunk]
+
+    return asyncio.run(main())
+
+
+STRATEGIES = {
+    "sequential": run_sequential,
+    "threads": run_threads,
+    "asyncio_gather": run_asyncio,
+    "processes": run_processes,
+}
+
+
+def run_suite(db_path, rows, queries, levels):
+    build_db(db_path, rows)
+    workload = make_workload(queries, rows)
+    results = []
+    for strategy, runner in STRATEGIES.items():
+        # Concurrency is meaningless for the sequential baseline
+        for level in ([1] if strategy == "sequential" else levels):
+            started = time.perf_counter()
+            latencies = runner(db_path, workload, level)
+            elapsed = time.perf_counter() - started
+            entry = {
+                "strategy": strategy,
+                "concurrency": level,
+                "queries": len(latencies),
+                "seconds": round(elapsed, 4),
+                "throughput_qps": round(len(latencies) / elapsed, 1),
+            }
+            entry.update(_percentiles(latencies))
+            results.append(entry)
+    return {
+        "rows": rows,
+        "queries": queries,
+        "cpu_count": os.cpu_count(),
+        "mix": [name for name, _, _ in QUERY_MIX],
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--levels", default="1,4,16",
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--db", default=None,
+                        help="database to build/reuse (default: temporary)")
+    args = parser.parse_args(argv)
+    levels = [int(level) for level in args.levels.split(",")]
+
+    if args.db:
+        report = run_suite(args.db, args.rows, args.queries, levels)
+    else:
+        with tempfile.TemporaryDirectory() as scratch:
+            report = run_suite(os.path.join(scratch, "users.db"),
+                               args.rows, args.queries, levels)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+6-memory_replica.py
+
+In-memory read replica of users.db.
+
+MemoryReplica copies the on-disk database into a shared-cache in-memory
+SQLite database with the backup API and serves reads from that copy.
+A refresh builds a new in-memory generation and swaps it in, so readers
+never wait on (or see half of) a refresh. Refreshes happen on demand,
+every `refresh_interval` seconds, or only when the source changed:
+`PRAGMA data_version` on a long-lived source connection moves whenever
+another connection commits to the file (rollback journal or WAL).
+Usage:
+    with MemoryReplica("users.db", refresh_interval=5) as replica:
+        rows = replica.execute("SELECT * FROM users WHERE id = ?", (1,))
+"""
+
+import time
+import sqlite3
+import itertools
+import threading
+
+_replica_ids = itertools.count(1)
+
+
+class MemoryReplica:
+    """Serve reads from an in-memory copy of a SQLite file."""
+
+    def __init__(self, db_path="users.db", refresh_interval=None):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self.generation = 0
+        self.refreshes = 0
+        self._name = f"replica_{next(_replica_ids)}"
+        self._source = sqlite3.connect(db_path, check_same_thread=False)
+        self._source_version = None
+        self._keeper = None  # keeps the current in-memory database alive
+        self._local = threading.local()
+        self._lock = threading.Lock()  # generation swap vs reader connect
+        self._refresh_lock = threading.Lock()  # refreshes and self._source
+        self._stop = threading.Event()
+        self._poller = None
+
+        self.refresh()
+        if refresh_interval:
+            self._poller = threading.Thread(target=self._poll, daemon=True)
+            self._poller.start()
+
+    def _uri(self, generation):
+        return f"file:{self._name}_{generation}?mode=memory&cache=shared"
+
+    def _data_version(self):
+        return self._source.execute("PRAGMA data_version").fetchone()[0]
+
+    def refresh(self):
+        """Copy the file into a new in-memory generation and swap it in."""
+        with self._refresh_lock:
+            self._refresh()
+
+    def _refresh(self):
+        # The copy is made without self._lock, so readers are not held up
+        generation = self.generation + 1
+        target = sqlite3.connect(self._uri(generation), uri=True,
+                                 check_same_thread=False)
+        version = self._data_version()
+        self._source.backup(target)
+        with self._lock:
+            old_keeper = self._keeper
+            self._keeper, self.generation = target, generation
+            self._source_version = version
+            self.refreshes += 1
+            if old_keeper is not None:
+                # Closed under the lock: a reader connects to a generation
+                # only while it holds the lock, so it never opens one whose
+                # last connection is gone (SQLite would create it empty).
+                # Readers already on it keep it alive until they reconnect
+                old_keeper.close()
+
+    def refresh_if_changed(self):
+        """Refresh only if the file was modified since the last copy."""
+        with self._refresh_lock:
+            changed = self._data_version() != self._source_version
+            if changed:
+                self._refresh()
+        return changed
+
+    def _poll(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh_if_changed()
+            except sqlite3.Error:
+                pass  # keep serving the last good copy
+
+    def connection(self):
+        """This thread's read-only connection to the current generation."""
+        cached = getattr(self._local, "conn", None)
+        if cached is not None and cached[0] == self.generation:
+            return cached[1]
+        if cached is not None:
+            cached[1].close()
+        with self._lock:
+            generation = self.generation
+            conn = sqlite3.connect(self._uri(generation), uri=True)
+        conn.execute("PRAGMA query_only = ON")
+        self._local.conn = (generation, conn)
+        return conn
+
+    def execute(self, query, params=()):
+        return self.connection().execute(query, params).fetchall()
+
+    def close(self):
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join()
+        with self._refresh_lock, self._lock:
+            if self._keeper is not None:
+                self._keeper.close()
+                self._keeper = None
+            self._source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+if __name__ == "__main__":
+    lookups = 10000
+    query = "SELECT * FROM users WHERE id = ?"
+
+    started = time.perf_counter()
+    for i in range(lookups):
+        conn = sqlite3.connect("users.db")
+        conn.execute(query, (i % 3 + 1,)).fetchall()
+        conn.close()
+    on_disk = time.perf_counter() - started
+
+    with MemoryReplica("users.db", refresh_interval=1) as replica:
+        print(replica.execute(query, (1,)))
+        started = time.perf_counter()
+        for i in range(lookups):
+            replica.execute(query, (i % 3 + 1,))
+        in_memory = time.perf_counter() - started
+
+    print(f"{lookups} lookups: connect-per-lookup on disk {on_disk:.3f}s, "
+          f"replica {in_memory:.3f}s")
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""Unit tests for 3-concurrent"""
+import os
+import time
+import asyncio
+import contextlib
+import sqlite3
+import tempfile
+import unittest
+
+concurrent_module = __import__('3-concurrent')
+AsyncConnectionPool = concurrent_module.AsyncConnectionPool
+fetch_as_completed = concurrent_module.fetch_as_completed
+stream_rows = concurrent_module.stream_rows
+
+RUNAWAY = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL "
+           "SELECT i + 1 FROM n) SELECT COUNT(*) FROM n")
+SLOW = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL "
+        "SELECT i + 1 FROM n WHERE i < 1000000) SELECT COUNT(*) FROM n")
+
+
+class TestConcurrent(unittest.TestCase):
+    """Pool bounds, deadlines and task cleanup of the async helpers."""
+
+    def setUp(self):
+        """A users table in a temporary database."""
+        self.scratch = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.scratch.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "age INTEGER)")
+        conn.executemany("INSERT INTO users VALUES (?, ?)",
+                         [(i, 20 + i) for i in range(1, 11)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        """Remove the database."""
+        self.scratch.cleanup()
+
+    def test_pool_bounds_fan_out(self):
+        """Gathered queries never hold more than max_size connections."""
+        async def main():
+            async with AsyncConnectionPool(self.path, max_size=2) as pool:
+                borrow = pool.connection
+                in_use, peak = [0], [0]
+
+                async def counting():
+                    async with borrow() as conn:
+                        in_use[0] += 1
+                        peak[0] = max(peak[0], in_use[0])
+                        try:
+                            yield conn
+                        finally:
+                            in_use[0] -= 1
+
+                pool.connection = contextlib.asynccontextmanager(counting)
+                results = await asyncio.gather(*(
+                    pool.fetchall("SELECT age FROM users WHERE id = ?", (i,))
+                    for i in range(1, 11)))
+                return results, peak[0], len(pool._all)
+
+        results, peak, opened = asyncio.run(main())
+        self.assertEqual(results, [[(20 + i,)] for i in range(1, 11)])
+        self.assertEqual(peak, 2)
+        self.assertEqual(opened, 2)
+
+    def test_timed_out_query_leaves_connection_usable(self):
+        """A timeout interrupts the statement; the connection is reused."""
+        async def main():
+            async with AsyncConnectionPool(self.path, max_size=1) as pool:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await pool.fetchall(RUNAWAY, timeout=0.05)
+                started = time.monotonic()
+                rows = await pool.fetchall("SELECT COUNT(*) FROM users",
+                                           timeout=1)
+                return rows, time.monotonic() - started, len(pool._all)
+
+        rows, elapsed, opened = asyncio.run(main())
+        self.assertEqual(rows, [(10,)])
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(opened, 1)
+
+    def test_fast_result_comes_first(self):
+        """Results are yielded in completion order."""
+        queries = {"slow": (SLOW, ()),
+                   "fast": ("SELECT COUNT(*) FROM users", ())}
+
+        async def main():
+            return [result async for result in
+                    fetch_as_completed(queries, db_name=self.path)]
+
+        results = asyncio.run(main())
+        self.assertEqual([result.name for result in results],
+                         ["fast", "slow"])
+        self.assertEqual(results[0].rows, [(10,)])
+        self.assertEqual(results[1].rows, [(1000000,)])
+
+    def test_deadline_yields_timed_out(self):
+        """Queries still running at the deadline come back timed out."""
+        queries = {"runaway": (RUNAWAY, ()),
+                   "fast": ("SELECT COUNT(*) FROM users", ())}
+
+        async def main():
+            async with AsyncConnectionPool(self.path, max_size=2) as pool:
+                started = time.monotonic()
+                results = [result async for result in fetch_as_completed(
+                    queries, deadline=0.1, pool=pool)]
+                return results, time.monotonic() - started
+
+        results, elapsed = asyncio.run(main())
+        self.assertEqual(
+            results,
+            [concurrent_module.QueryResult("fast", [(10,)], False),
+             concurrent_module.QueryResult("runaway", None, True)])
+        self.assertLess(elapsed, 1)
+
+    def test_aclose_cancels_pending_tasks(self):
+        """Stopping after the first result leaves no query running."""
+        queries = {"runaway": (RUNAWAY, ()),
+                   "fast": ("SELECT COUNT(*) FROM users", ())}
+
+        async def main():
+            results = fetch_as_completed(queries, db_name=self.path)
+            first = await results.__anext__()
+            await results.aclose()
+            current = asyncio.current_task()
+            for _ in range(100):
+                others = asyncio.all_tasks() - {current}
+                if not others:
+                    break
+                await asyncio.sleep(0.01)
+            return first, others
+
+        first, others = asyncio.run(main())
+        self.assertEqual(first.name, "fast")
+        self.assertEqual(others, set())
+
+    def test_stream_rows_stops_early(self):
+        """stream_rows yields in order and can be left part way."""
+        async def main():
+            async with AsyncConnectionPool(self.path, max_size=1) as pool:
+                ages = []
+                rows = stream_rows("SELECT age FROM users ORDER BY id",
+                                   pool=pool, chunk_size=3)
+                async with contextlib.aclosing(rows):
+                    async for (age,) in rows:
+                        ages.append(age)
+                        if len(ages) == 4:
+                            break
+                # Closing returned the only connection to the pool
+                rows = await pool.fetchall("SELECT COUNT(*) FROM users")
+                return ages, rows
+
+        self.assertEqual(asyncio.run(main()), ([21, 22, 23, 24], [(10,)]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""Unit tests for 1-execute.ExecuteQuery and ExecuteBatch"""
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+execute_module = __import__('1-execute')
+ExecuteQuery = execute_module.ExecuteQuery
+ExecuteBatch = execute_module.ExecuteBatch
+Many = execute_module.Many
+QueryTimeoutError = execute_module.QueryTimeoutError
+
+
+class _UsersDB(unittest.TestCase):
+    """A users table in a temporary database."""
+
+    def setUp(self):
+        """Create the table with two users."""
+        self.scratch = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.scratch.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "age INTEGER)")
+        conn.executemany("INSERT INTO users VALUES (?, ?)",
+                         [(1, 20), (2, 30)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        """Remove the database."""
+        self.scratch.cleanup()
+
+    def users(self):
+        """(id, age) rows committed to the file."""
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute("SELECT * FROM users ORDER BY id").fetchall()
+        finally:
+            conn.close()
+
+
+class TestExecuteQuery(_UsersDB):
+    """Results, timeouts and cleanup of ExecuteQuery."""
+
+    def test_results(self):
+        """The block receives the query's rows."""
+        with ExecuteQuery(self.path, "SELECT id FROM users WHERE age > ?",
+                          (25,)) as rows:
+            self.assertEqual(rows, [(2,)])
+
+    def test_failed_enter_closes_connection(self):
+        """Any error in __enter__ closes the connection it opened."""
+        query = ExecuteQuery(self.path, "SELECT * FROM users WHERE id = ?",
+                             (1, 2))
+        with self.assertRaises(sqlite3.ProgrammingError):
+            query.__enter__()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            query.conn.execute("SELECT 1")
+
+    def test_timeout(self):
+        """A statement running past its timeout raises QueryTimeoutError."""
+        runaway = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL "
+                   "SELECT i + 1 FROM n) SELECT COUNT(*) FROM n")
+        query = ExecuteQuery(self.path, runaway, timeout=0.05)
+        with self.assertRaises(QueryTimeoutError):
+            query.__enter__()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            query.conn.execute("SELECT 1")
+
+    def test_stream_stops_early_and_closes(self):
+        """stream=True fetches in batches; leaving the block closes it."""
+        conn = sqlite3.connect(self.path)
+        conn.executemany("INSERT INTO users VALUES (?, ?)",
+                         [(i, 40) for i in range(3, 11)])
+        conn.commit()
+        conn.close()
+        query = ExecuteQuery(self.path, "SELECT id FROM users ORDER BY id",
+                             stream=True, fetch_size=3)
+        with query as rows:
+            self.assertEqual(query.cursor.arraysize, 3)
+            self.assertEqual([next(rows) for _ in range(4)],
+                             [(1,), (2,), (3,), (4,)])
+        self.assertEqual(list(rows), [])
+        with self.assertRaises(sqlite3.ProgrammingError):
+            query.cursor.fetchone()
+        with self.assertRaises(sqlite3.ProgrammingError):
+            query.conn.execute("SELECT 1")
+
+
+class TestExecuteBatch(_UsersDB):
+    """Results, atomicity and locking of ExecuteBatch."""
+
+    def run_batch(self, queries):
+        """Run a batch; return its results and the statements it sent."""
+        statements = []
+        connect = sqlite3.connect
+
+        def traced(*args, **kwargs):
+            conn = connect(*args, **kwargs)
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        with patch.object(execute_module.sqlite3, "connect", traced):
+            with ExecuteBatch(self.path, queries) as results:
+                return results, statements
+
+    def test_results_by_name(self):
+        """Reads map to rows, writes to their rowcount."""
+        results, statements = self.run_batch({
+            "add": Many("INSERT INTO users VALUES (?, ?)",
+                        [(3, 40), (4, 50)]),
+            "older": ("SELECT id FROM users WHERE age > ?", (25,)),
+            "bump": ("UPDATE users SET age = age + 1", None),
+        })
+        self.assertEqual(results, {"add": 2, "older": [(2,), (3,), (4,)],
+                                   "bump": 4})
+        self.assertIn("BEGIN IMMEDIATE", statements)
+        self.assertEqual(self.users(), [(1, 21), (2, 31), (3, 41), (4, 51)])
+
+    def test_failing_entry_rolls_back_batch(self):
+        """A failing entry undoes the writes before it."""
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.run_batch({
+                "add": Many("INSERT INTO users VALUES (?, ?)", [(3, 40)]),
+                "clash": ("INSERT INTO users VALUES (1, 0)", None),
+            })
+        self.assertEqual(self.users(), [(1, 20), (2, 30)])
+
+    def test_lock_mode_follows_statements(self):
+        """Plain write entries take the write lock up front too."""
+        _, statements = self.run_batch({
+            "older": ("SELECT id FROM users WHERE age > ?", (25,)),
+        })
+        self.assertIn("BEGIN", statements)
+        self.assertNotIn("BEGIN IMMEDIATE", statements)
+        results, statements = self.run_batch({
+            "older": ("SELECT id FROM users WHERE age > ?", (25,)),
+            "bump": ("WITH one(i) AS (SELECT 1) "
+                     "UPDATE users SET age = age + 1 "
+                     "WHERE id IN (SELECT i FROM one)", ()),
+        })
+        self.assertIn("BEGIN IMMEDIATE", statements)
+        self.assertEqual(results["older"], [(2,)])
+        self.assertEqual(self.users(), [(1, 21), (2, 30)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Unit tests for 6-memory_replica.MemoryReplica"""
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+MemoryReplica = __import__('6-memory_replica').MemoryReplica
+
+
+class TestMemoryReplica(unittest.TestCase):
+    """Reads, refreshes and generation swaps of MemoryReplica."""
+
+    def setUp(self):
+        """A small users database in a temporary directory."""
+        self.scratch = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.scratch.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "name TEXT)")
+        conn.executemany("INSERT INTO users VALUES (?, ?)",
+                         [(1, "a"), (2, "b")])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        """Remove the database."""
+        self.scratch.cleanup()
+
+    def write(self, query, params=()):
+        """Commit one write to the file behind the replica."""
+        conn = sqlite3.connect(self.path)
+        conn.execute(query, params)
+        conn.commit()
+        conn.close()
+
+    def test_refresh_if_changed(self):
+        """Only commits to the file trigger a new generation."""
+        with MemoryReplica(self.path) as replica:
+            query = "SELECT COUNT(*) FROM users"
+            self.assertEqual(replica.execute(query), [(2,)])
+            self.assertFalse(replica.refresh_if_changed())
+            self.write("INSERT INTO users VALUES (3, 'c')")
+            self.assertEqual(replica.execute(query), [(2,)])
+            self.assertTrue(replica.refresh_if_changed())
+            self.assertEqual(replica.execute(query), [(3,)])
+            self.assertEqual(replica.generation, 2)
+
+    def test_reader_connecting_during_refresh(self):
+        """A refresh racing a reader's connect never empties its copy."""
+        replica = MemoryReplica(self.path)
+        self.addCleanup(replica.close)
+        uri = replica._uri
+        refresher = threading.Thread(target=replica.refresh)
+
+        def slow_uri(generation):
+            # The reader has picked its generation: let a refresh run
+            # before it connects
+            if threading.current_thread() is threading.main_thread() \
+                    and refresher.ident is None:
+                refresher.start()
+                time.sleep(0.1)
+            return uri(generation)
+
+        replica._uri = slow_uri
+        self.assertEqual(replica.execute("SELECT name FROM users"),
+                         [("a",), ("b",)])
+        refresher.join()
+        self.assertEqual(replica.generation, 2)
+        self.assertEqual(replica.execute("SELECT COUNT(*) FROM users"),
+                         [(2,)])
+
+    def test_reads_during_refreshes(self):
+        """Concurrent readers always see a complete table."""
+        errors = []
+        stop = threading.Event()
+        with MemoryReplica(self.path) as replica:
+            def reader():
+                while not stop.is_set():
+                    try:
+                        rows = replica.execute("SELECT COUNT(*) FROM users")
+                        if rows != [(2,)]:
+                            errors.append(rows)
+                    except sqlite3.Error as e:
+                        errors.append(e)
+
+            readers = [threading.Thread(target=reader) for _ in range(4)]
+            for thread in readers:
+                thread.start()
+            for _ in range(30):
+                replica.refresh()
+            stop.set()
+            for thread in readers:
+                thread.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
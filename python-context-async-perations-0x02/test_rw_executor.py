@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Unit tests for 4-rw_executor.ReadWriteExecutor"""
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+ReadWriteExecutor = __import__('4-rw_executor').ReadWriteExecutor
+
+
+class TestReadWriteExecutor(unittest.TestCase):
+    """Reads, batched writes and shutdown of ReadWriteExecutor."""
+
+    def setUp(self):
+        """A users table in a temporary database."""
+        self.scratch = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.scratch.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "age INTEGER)")
+        conn.executemany("INSERT INTO users VALUES (?, ?)",
+                         [(1, 20), (2, 30)])
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        """Remove the database."""
+        self.scratch.cleanup()
+
+    def test_reads_and_writes(self):
+        """Writes commit; a failing write fails alone."""
+        with ReadWriteExecutor(self.path, readers=2) as db:
+            ok = db.write("UPDATE users SET age = 21 WHERE id = 1")
+            bad = db.write("INSERT INTO users VALUES (2, 0)")
+            many = db.write_many("INSERT INTO users VALUES (?, ?)",
+                                 [(3, 40), (4, 50)])
+            self.assertEqual(ok.result(timeout=5), 1)
+            with self.assertRaises(sqlite3.IntegrityError):
+                bad.result(timeout=5)
+            self.assertEqual(many.result(timeout=5), 2)
+            rows = db.read("SELECT id, age FROM users ORDER BY id")
+            self.assertEqual(rows.result(timeout=5),
+                             [(1, 21), (2, 30), (3, 40), (4, 50)])
+
+    def test_writer_survives_base_exception(self):
+        """A batch aborted by a BaseException fails; later writes run."""
+        def interrupted():
+            yield (3, 40)
+            raise KeyboardInterrupt
+
+        with ReadWriteExecutor(self.path, readers=1) as db:
+            bad = db.write_many("INSERT INTO users VALUES (?, ?)",
+                                interrupted())
+            with self.assertRaises(KeyboardInterrupt):
+                bad.result(timeout=5)
+            ok = db.write("UPDATE users SET age = 21 WHERE id = 1")
+            self.assertEqual(ok.result(timeout=5), 1)
+            rows = db.read("SELECT id, age FROM users ORDER BY id")
+            self.assertEqual(rows.result(timeout=5), [(1, 21), (2, 30)])
+
+    def test_close_flushes_then_rejects_writes(self):
+        """Writes queued before close() commit; later ones are refused."""
+        db = ReadWriteExecutor(self.path, readers=1)
+        pending = db.write("UPDATE users SET age = 99 WHERE id = 2")
+        db.close()
+        self.assertEqual(pending.result(timeout=5), 1)
+        with self.assertRaises(RuntimeError):
+            db.write("UPDATE users SET age = 0")
+        with self.assertRaises(RuntimeError):
+            db.write_many("UPDATE users SET age = ?", [(0,)])
+        db.close()  # closing twice is harmless
+
+    def test_writes_racing_close_never_hang(self):
+        """Every write either resolves or is refused while closing."""
+        db = ReadWriteExecutor(self.path, readers=1)
+        futures, refused = [], []
+
+        def writer():
+            for _ in range(200):
+                try:
+                    futures.append(db.write(
+                        "UPDATE users SET age = age + 1 WHERE id = 1"))
+                except RuntimeError:
+                    refused.append(1)
+
+        threads = [threading.Thread(target=writer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        db.close()
+        for thread in threads:
+            thread.join()
+        for future in futures:
+            self.assertEqual(future.result(timeout=5), 1)
+        self.assertEqual(len(futures) + len(refused), 800)
+
+
+if __name__ == "__main__":
+    unittest.main()
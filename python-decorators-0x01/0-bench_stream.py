@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Peak-memory benchmark: fetch_all_users vs stream_all_users.
+
+Builds users.db tables of growing size in a scratch directory and measures
+peak Python allocations (tracemalloc) while consuming every row.
+Usage:
+    python3 0-bench_stream.py
+"""
+import os
+import sqlite3
+import tempfile
+import tracemalloc
+import contextlib
+import io
+
+log_queries_module = __import__('0-log_queries')
+fetch_all_users = log_queries_module.fetch_all_users
+stream_all_users = log_queries_module.stream_all_users
+
+
+def _seed(rows):
+    if os.path.exists("users.db"):
+        os.remove("users.db")
+    conn = sqlite3.connect("users.db")
+    conn.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT)"
+    )
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                     ((i, f"user{i}", f"user{i}@example.com")
+                      for i in range(rows)))
+    conn.commit()
+    conn.close()
+
+
+def _peak_kib(consume):
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):  # silence query logging
+        consume()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main(sizes=(10000, 100000, 300000)):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            for rows in sizes:
+                _seed(rows)
+                query = "SELECT * FROM users"
+                eager = _peak_kib(lambda: len(fetch_all_users(query=query)))
+                lazy = _peak_kib(
+                    lambda: sum(1 for _ in stream_all_users(query=query))
+                )
+                print(f"{rows:>7} rows: fetchall peak={eager:10,.0f} KiB   "
+                      f"streaming peak={lazy:8,.0f} KiB")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,5 +27,31 @@ def fetch_all_users(query):
     return results
 
 
-# fetch users while logging the query
-users = fetch_all_users(query="SELECT * FROM users")
+@log_queries
+def stream_all_users(query, arraysize=500):
+    """
+    Streaming variant of fetch_all_users: yields rows while fetching
+    `arraysize` rows per round trip, so memory stays flat however big the
+    table is. The connection is closed once the generator is exhausted
+    or closed.
+    """
+    conn = sqlite3.connect('users.db')
+    try:
+        cursor = conn.cursor()
+        cursor.arraysize = arraysize
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    # fetch users while logging the query
+    users = fetch_all_users(query="SELECT * FROM users")
+
+    for user in stream_all_users(query="SELECT * FROM users", arraysize=100):
+        print(user)
@@ -1,20 +1,149 @@
 #!/usr/bin/python3
+import time
 import sqlite3
+import inspect
 import functools
+import contextvars
+
+
+query_metrics = {"timeouts": 0}
+_deadline = contextvars.ContextVar("query_deadline", default=None)
+_PROGRESS_STEPS = 1000  # VM instructions between deadline checks
+
+
+class QueryTimeoutError(sqlite3.OperationalError):
+    """Raised when a statement was interrupted because its deadline passed."""
+
+
+def _resolve_deadline(timeout):
+    """Absolute deadline `timeout` seconds from now, capped by an outer one."""
+    outer = _deadline.get()
+    if timeout is None:
+        return outer
+    deadline = time.monotonic() + timeout
+    return deadline if outer is None else min(outer, deadline)
+
+
+def _deadline_handler(deadline):
+    # SQLite calls this every _PROGRESS_STEPS instructions; returning True
+    # aborts the running statement with OperationalError("interrupted")
+    return lambda: time.monotonic() >= deadline
+
+
+def _timeout_error(exc, deadline):
+    """Turn an "interrupted" error past the deadline into QueryTimeoutError."""
+    if deadline is None or "interrupted" not in str(exc):
+        return None
+    query_metrics["timeouts"] += 1
+    return QueryTimeoutError(f"query exceeded its deadline: {exc}")
+
+
+def _with_deadline(rows, deadline):
+    """
+    Yield from generator `rows` with _deadline set only while its code
+    runs, so nested decorators see the deadline but the consumer does not
+    between rows.
+    """
+    try:
+        while True:
+            token = _deadline.set(deadline)
+            try:
+                row = next(rows)
+            except StopIteration:
+                return
+            finally:
+                _deadline.reset(token)
+            yield row
+    finally:
+        rows.close()
+
 
 def with_db_connection(func):
     """
     Decorator that opens a SQLite connection to 'users.db',
     injects it as the first argument to the wrapped function,
     and ensures the connection is closed after the function returns.
+    Coroutine functions get an aiosqlite connection instead, so the
+    event loop is never blocked on SQLite I/O; generator functions keep
+    theirs open for as long as the generator is consumed.
+    Pass query_timeout=<seconds> to any call to interrupt the running
+    statement once the deadline passes (QueryTimeoutError); nested
+    decorators share the earliest deadline.
     """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            import aiosqlite  # only needed by async callers
+            deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
+            conn = await aiosqlite.connect("users.db")
+            token = _deadline.set(deadline)
+            try:
+                if deadline is not None:
+                    await conn.set_progress_handler(
+                        _deadline_handler(deadline), _PROGRESS_STEPS)
+                return await func(conn, *args, **kwargs)
+            except QueryTimeoutError:
+                raise
+            except sqlite3.OperationalError as e:
+                timeout_error = _timeout_error(e, deadline)
+                if timeout_error is None:
+                    raise
+                raise timeout_error from e
+            finally:
+                _deadline.reset(token)
+                try:
+                    await conn.close()
+                except Exception:
+                    pass
+        return async_wrapper
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def gen_wrapper(*args, **kwargs):
+            # Keep the connection open until the caller finishes (or closes)
+            # the generator, not just until the generator object is created
+            deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
+            conn = sqlite3.connect("users.db")
+            if deadline is not None:
+                conn.set_progress_handler(_deadline_handler(deadline),
+                                          _PROGRESS_STEPS)
+            try:
+                yield from _with_deadline(func(conn, *args, **kwargs),
+                                          deadline)
+            except QueryTimeoutError:
+                raise
+            except sqlite3.OperationalError as e:
+                timeout_error = _timeout_error(e, deadline)
+                if timeout_error is None:
+                    raise
+                raise timeout_error from e
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        return gen_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
         conn = sqlite3.connect("users.db")
+        if deadline is not None:
+            conn.set_progress_handler(_deadline_handler(deadline),
+                                      _PROGRESS_STEPS)
+        token = _deadline.set(deadline)
         try:
             # Call wrapped function with conn injected as first argument
             return func(conn, *args, **kwargs)
+        except QueryTimeoutError:
+            raise
+        except sqlite3.OperationalError as e:
+            timeout_error = _timeout_error(e, deadline)
+            if timeout_error is None:
+                raise
+            raise timeout_error from e
         finally:
+            _deadline.reset(token)
             # Ensure the connection is always closed
             try:
                 conn.close()
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+"""
+Write-throughput benchmark: one commit per call vs group commit.
+
+Runs in a scratch directory with its own users.db, so the real database is
+never touched. Several threads update emails concurrently, first through
+update_user_email (one connection + one commit per call), then through a
+GroupCommitter that shares one commit between the calls of a batch.
+Usage:
+    python3 2-bench_transactional.py [threads] [updates_per_thread]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+
+transactional_module = __import__('2-transactional')
+GroupCommitter = transactional_module.GroupCommitter
+transactional = transactional_module.transactional
+update_user_email = transactional_module.update_user_email
+
+
+def _seed(path, users=1000):
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT)"
+    )
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?)",
+                     [(i, f"user{i}", f"user{i}@example.com")
+                      for i in range(1, users + 1)])
+    conn.commit()
+    conn.close()
+
+
+def _measure(label, update, threads, updates):
+    def worker(offset):
+        for i in range(updates):
+            user_id = (offset * updates + i) % 1000 + 1
+            update(user_id=user_id, new_email=f"new{i}@example.com")
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    total = threads * updates
+    print(f"{label:<16} {total} updates in {elapsed:.2f}s "
+          f"-> {total / elapsed:,.0f} updates/sec")
+
+
+def main(threads=32, updates=50):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            _seed("users.db")
+            _measure("commit per call", update_user_email, threads, updates)
+
+            committer = GroupCommitter("users.db", window=0.002)
+
+            @transactional(group_commit=committer)
+            def update_user_email_grouped(conn, user_id, new_email):
+                cursor = conn.cursor()
+                cursor.execute("UPDATE users SET email = ? WHERE id = ?",
+                               (new_email, user_id))
+
+            _measure("group commit", update_user_email_grouped,
+                     threads, updates)
+            committer.close()
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
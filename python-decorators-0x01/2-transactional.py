@@ -1,6 +1,65 @@
 #!/usr/bin/python3
+import time
+import queue
+import itertools
 import sqlite3
+import inspect
 import functools
+import threading
+import contextvars
+from concurrent.futures import Future
+
+
+query_metrics = {"timeouts": 0}
+_deadline = contextvars.ContextVar("query_deadline", default=None)
+_PROGRESS_STEPS = 1000  # VM instructions between deadline checks
+
+
+class QueryTimeoutError(sqlite3.OperationalError):
+    """Raised when a statement was interrupted because its deadline passed."""
+
+
+def _resolve_deadline(timeout):
+    """Absolute deadline `timeout` seconds from now, capped by an outer one."""
+    outer = _deadline.get()
+    if timeout is None:
+        return outer
+    deadline = time.monotonic() + timeout
+    return deadline if outer is None else min(outer, deadline)
+
+
+def _deadline_handler(deadline):
+    # SQLite calls this every _PROGRESS_STEPS instructions; returning True
+    # aborts the running statement with OperationalError("interrupted")
+    return lambda: time.monotonic() >= deadline
+
+
+def _timeout_error(exc, deadline):
+    """Turn an "interrupted" error past the deadline into QueryTimeoutError."""
+    if deadline is None or "interrupted" not in str(exc):
+        return None
+    query_metrics["timeouts"] += 1
+    return QueryTimeoutError(f"query exceeded its deadline: {exc}")
+
+
+def _with_deadline(rows, deadline):
+    """
+    Yield from generator `rows` with _deadline set only while its code
+    runs, so nested decorators see the deadline but the consumer does not
+    between rows.
+    """
+    try:
+        while True:
+            token = _deadline.set(deadline)
+            try:
+                row = next(rows)
+            except StopIteration:
+                return
+            finally:
+                _deadline.reset(token)
+            yield row
+    finally:
+        rows.close()
 
 
 def with_db_connection(func):
@@ -8,25 +67,234 @@ def with_db_connection(func):
     Decorator that opens a SQLite connection to 'users.db',
     injects it as the first argument to the wrapped function,
     and ensures the connection is closed after the function returns.
+    Coroutine functions get an aiosqlite connection instead, so the
+    event loop is never blocked on SQLite I/O; generator functions keep
+    theirs open for as long as the generator is consumed.
+    Pass query_timeout=<seconds> to any call to interrupt the running
+    statement once the deadline passes (QueryTimeoutError); nested
+    decorators share the earliest deadline.
     """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            import aiosqlite  # only needed by async callers
+            deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
+            conn = await aiosqlite.connect("users.db")
+            token = _deadline.set(deadline)
+            try:
+                if deadline is not None:
+                    await conn.set_progress_handler(
+                        _deadline_handler(deadline), _PROGRESS_STEPS)
+                return await func(conn, *args, **kwargs)
+            except QueryTimeoutError:
+                raise
+            except sqlite3.OperationalError as e:
+                timeout_error = _timeout_error(e, deadline)
+                if timeout_error is None:
+                    raise
+                raise timeout_error from e
+            finally:
+                _deadline.reset(token)
+                try:
+                    await conn.close()
+                except Exception:
+                    pass
+        return async_wrapper
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def gen_wrapper(*args, **kwargs):
+            # Keep the connection open until the caller finishes (or closes)
+            # the generator, not just until the generator object is created
+            deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
+            conn = sqlite3.connect("users.db")
+            if deadline is not None:
+                conn.set_progress_handler(_deadline_handler(deadline),
+                                          _PROGRESS_STEPS)
+            try:
+                yield from _with_deadline(func(conn, *args, **kwargs),
+                                          deadline)
+            except QueryTimeoutError:
+                raise
+            except sqlite3.OperationalError as e:
+                timeout_error = _timeout_error(e, deadline)
+                if timeout_error is None:
+                    raise
+                raise timeout_error from e
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        return gen_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
         conn = sqlite3.connect("users.db")
+        if deadline is not None:
+            conn.set_progress_handler(_deadline_handler(deadline),
+                                      _PROGRESS_STEPS)
+        token = _deadline.set(deadline)
         try:
+            # Call wrapped function with conn injected as first argument
             return func(conn, *args, **kwargs)
+        except QueryTimeoutError:
+            raise
+        except sqlite3.OperationalError as e:
+            timeout_error = _timeout_error(e, deadline)
+            if timeout_error is None:
+                raise
+            raise timeout_error from e
         finally:
+            _deadline.reset(token)
+            # Ensure the connection is always closed
             try:
                 conn.close()
             except Exception:
+                # swallow close errors (optional: log in real code)
                 pass
     return wrapper
 
 
-def transactional(func):
+class GroupCommitter:
+    """
+    Shares one transaction (one commit, one fsync) between many callers.
+    Calls submitted within `window` seconds, up to `max_batch` of them, run
+    on a single background connection inside one BEGIN ... COMMIT. Each call
+    runs under its own SAVEPOINT, so a failing call is rolled back alone and
+    only that caller sees the exception; the others still commit.
+    Submitting after close() starts a new background thread.
+    """
+
+    def __init__(self, db_path="users.db", window=0.005, max_batch=100):
+        self.db_path = db_path
+        self.window = window
+        self.max_batch = max_batch
+        self.commits = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(conn, *args, **kwargs) and return a Future for it."""
+        future = Future()
+        # Queue under the lock: close() cannot slip its stop marker in
+        # between, which would leave this call to a thread that has exited
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._queue.put((future, func, args, kwargs))
+        return future
+
+    def close(self):
+        """Flush pending calls and stop the background thread."""
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is None:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        try:
+            # Take the write lock up front: contention fails (or waits) here
+            # once, not inside some caller's savepoint
+            conn.execute("BEGIN IMMEDIATE")
+            for future, func, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT group_call")
+                try:
+                    result = func(conn, *args, **kwargs)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO group_call")
+                    conn.execute("RELEASE group_call")
+                    outcomes.append((future, None, e))
+                else:
+                    conn.execute("RELEASE group_call")
+                    outcomes.append((future, result, None))
+            conn.execute("COMMIT")
+            self.commits += 1
+        except BaseException as e:
+            # The shared transaction itself failed: nobody's work was saved.
+            # Swallowed so the thread keeps serving later calls
+            if conn.in_transaction:
+                conn.rollback()
+            for future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+def transactional(func=None, *, group_commit=None):
     """
     Decorator that wraps DB operations inside a transaction.
     Commits on success, rollbacks on error.
+    With group_commit=GroupCommitter(...), the wrapped function no longer
+    takes a connection: calls are batched into shared transactions and each
+    caller blocks until its own call has committed (or raises its own error).
+    Coroutine functions are awaited and commit/rollback their aiosqlite
+    connection without blocking the event loop.
     """
+    if func is None:
+        return functools.partial(transactional, group_commit=group_commit)
+
+    if group_commit is not None:
+        if inspect.iscoroutinefunction(func):
+            raise TypeError("group_commit needs a synchronous function: "
+                            "it runs on the committer's own connection")
+
+        @functools.wraps(func)
+        def grouped(*args, **kwargs):
+            return group_commit.submit(func, *args, **kwargs).result()
+        return grouped
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            try:
+                result = await func(conn, *args, **kwargs)
+                await conn.commit()
+                return result
+            except Exception:
+                await conn.rollback()
+                raise
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
         try:
@@ -46,7 +314,70 @@ def update_user_email(conn, user_id, new_email):
     cursor.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, user_id))
 
 
+def _chunks(rows, size):
+    """Yield lists of up to `size` items without materializing `rows`."""
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@transactional
+def _execute_chunk(conn, query, chunk):
+    cursor = conn.cursor()
+    cursor.executemany(query, chunk)
+    return cursor.rowcount
+
+
+@with_db_connection
+def bulk_execute(conn, query, rows, chunk_size=1000):
+    """
+    Run `query` once per parameter tuple in `rows` (any iterable, consumed
+    lazily) with executemany, committing one transaction per chunk.
+    A failing chunk is rolled back and re-raised; earlier chunks stay
+    committed. Returns stats: rows, changed, chunks, seconds, rows_per_sec.
+    """
+    stats = {"rows": 0, "changed": 0, "chunks": 0}
+    started = time.perf_counter()
+    for chunk in _chunks(rows, chunk_size):
+        stats["changed"] += _execute_chunk(conn, query, chunk)
+        stats["rows"] += len(chunk)
+        stats["chunks"] += 1
+    stats["seconds"] = time.perf_counter() - started
+    stats["rows_per_sec"] = (
+        stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    )
+    return stats
+
+
+def bulk_update_user_emails(rows, chunk_size=1000):
+    """Bulk update_user_email: `rows` yields (user_id, new_email) pairs."""
+    return bulk_execute(
+        "UPDATE users SET email = ? WHERE id = ?",
+        ((new_email, user_id) for user_id, new_email in rows),
+        chunk_size=chunk_size,
+    )
+
+
+def bulk_insert_users(rows, columns=("id", "name", "email"), chunk_size=1000):
+    """Bulk insert: `rows` yields tuples matching `columns`."""
+    placeholders = ", ".join("?" for _ in columns)
+    return bulk_execute(
+        f"INSERT INTO users ({', '.join(columns)}) VALUES ({placeholders})",
+        rows,
+        chunk_size=chunk_size,
+    )
+
+
 # Example usage
 if __name__ == "__main__":
     update_user_email(user_id=1, new_email="Crawford_Cartwright@hotmail.com")
     print("Email updated successfully!")
+
+    stats = bulk_update_user_emails(
+        (user_id, f"user{user_id}@example.com") for user_id in range(1, 4)
+    )
+    print(f"Bulk update: {stats['rows']} rows in {stats['seconds']:.3f}s "
+          f"({stats['rows_per_sec']:,.0f} rows/sec)")
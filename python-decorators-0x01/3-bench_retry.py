@@ -0,0 +1,113 @@
+#!/usr/bin/python3
+"""
+Lock-contention benchmark for retry_on_failure.
+
+Several threads hammer one SQLite file with short write transactions using
+timeout=0, so every conflict surfaces as "database is locked". The old
+fixed-delay retry is compared with exponential backoff, with and without
+full jitter, all starting from the same base delay.
+Usage:
+    python3 3-bench_retry.py [threads] [writes_per_thread]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import threading
+
+retry_module = __import__('3-retry_on_failure')
+retry_on_failure = retry_module.retry_on_failure
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _run(label, decorator, db_path, threads, writes):
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    @decorator
+    def write_once(conn, user_id):
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE users SET hits = hits + 1 WHERE id = ?",
+                         (user_id,))
+            time.sleep(0.001)  # hold the write lock briefly, like real work
+            conn.commit()
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+    def worker(user_id):
+        conn = sqlite3.connect(db_path, timeout=0, isolation_level=None)
+        try:
+            for _ in range(writes):
+                started = time.perf_counter()
+                try:
+                    write_once(conn, user_id)
+                except sqlite3.OperationalError:
+                    with lock:
+                        failures.append(1)
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                time.sleep(random.uniform(0, 0.004))  # think time
+        finally:
+            conn.close()
+
+    pool = [threading.Thread(target=worker, args=(i % 10 + 1,))
+            for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"{label:<18} ok={len(latencies):<5} failed={len(failures):<4} "
+          f"p50={_percentile(latencies, 50) * 1000:7.1f}ms "
+          f"p95={_percentile(latencies, 95) * 1000:7.1f}ms "
+          f"p99={_percentile(latencies, 99) * 1000:7.1f}ms "
+          f"max={max(latencies) * 1000:7.1f}ms "
+          f"wall={elapsed:.2f}s")
+
+
+def main(threads=16, writes=25):
+    fd, db_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE users "
+                     "(id INTEGER PRIMARY KEY, hits INTEGER)")
+        conn.executemany("INSERT INTO users VALUES (?, 0)",
+                         [(i,) for i in range(1, 11)])
+        conn.commit()
+        conn.close()
+
+        # Same base delay everywhere, so only the policy differs
+        base, cap = 0.005, 0.04
+        _run("fixed delay",
+             retry_on_failure(retries=1000, delay=base, backoff=1,
+                              jitter=False, deadline=2.0),
+             db_path, threads, writes)
+        _run("backoff",
+             retry_on_failure(retries=1000, delay=base, max_delay=cap,
+                              jitter=False, deadline=2.0),
+             db_path, threads, writes)
+        _run("backoff + jitter",
+             retry_on_failure(retries=1000, delay=base, max_delay=cap,
+                              deadline=2.0),
+             db_path, threads, writes)
+    finally:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
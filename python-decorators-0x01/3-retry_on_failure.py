@@ -1,7 +1,64 @@
 #!/usr/bin/python3
 import time
+import asyncio
+import random
 import sqlite3
+import inspect
 import functools
+import threading
+import contextvars
+
+
+query_metrics = {"timeouts": 0}
+_deadline = contextvars.ContextVar("query_deadline", default=None)
+_PROGRESS_STEPS = 1000  # VM instructions between deadline checks
+
+
+class QueryTimeoutError(sqlite3.OperationalError):
+    """Raised when a statement was interrupted because its deadline passed."""
+
+
+def _resolve_deadline(timeout):
+    """Absolute deadline `timeout` seconds from now, capped by an outer one."""
+    outer = _deadline.get()
+    if timeout is None:
+        return outer
+    deadline = time.monotonic() + timeout
+    return deadline if outer is None else min(outer, deadline)
+
+
+def _deadline_handler(deadline):
+    # SQLite calls this every _PROGRESS_STEPS instructions; returning True
+    # aborts the running statement with OperationalError("interrupted")
+    return lambda: time.monotonic() >= deadline
+
+
+def _timeout_error(exc, deadline):
+    """Turn an "interrupted" error past the deadline into QueryTimeoutError."""
+    if deadline is None or "interrupted" not in str(exc):
+        return None
+    query_metrics["timeouts"] += 1
+    return QueryTimeoutError(f"query exceeded its deadline: {exc}")
+
+
+def _with_deadline(rows, deadline):
+    """
+    Yield from generator `rows` with _deadline set only while its code
+    runs, so nested decorators see the deadline but the consumer does not
+    between rows.
+    """
+    try:
+        while True:
+            token = _deadline.set(deadline)
+            try:
+                row = next(rows)
+            except StopIteration:
+                return
+            finally:
+                _deadline.reset(token)
+            yield row
+    finally:
+        rows.close()
 
 
 def with_db_connection(func):
@@ -9,13 +66,85 @@ def with_db_connection(func):
     Decorator that opens a SQLite connection to 'users.db',
     injects it as the first argument to the wrapped function,
     and ensures the connection is closed after the function returns.
+    Coroutine functions get an aiosqlite connection instead; generator
+    functions keep theirs open for as long as the generator is consumed.
+    Pass query_timeout=<seconds> to any call to interrupt the running
+    statement once the deadline passes (QueryTimeoutError); nested
+    decorators share the earliest deadline.
     """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            import aiosqlite  # only needed by async callers
+            deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
+            conn = await aiosqlite.connect("users.db")
+            token = _deadline.set(deadline)
+            try:
+                if deadline is not None:
+                    await conn.set_progress_handler(
+                        _deadline_handler(deadline), _PROGRESS_STEPS)
+                return await func(conn, *args, **kwargs)
+            except QueryTimeoutError:
+                raise
+            except sqlite3.OperationalError as e:
+                timeout_error = _timeout_error(e, deadline)
+                if timeout_error is None:
+                    raise
+                raise timeout_error from e
+            finally:
+                _deadline.reset(token)
+                try:
+                    await conn.close()
+                except Exception:
+                    pass
+        return async_wrapper
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def gen_wrapper(*args, **kwargs):
+            # Keep the connection open until the caller finishes (or closes)
+            # the generator, not just until the generator object is created
+            deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
+            conn = sqlite3.connect("users.db")
+            if deadline is not None:
+                conn.set_progress_handler(_deadline_handler(deadline),
+                                          _PROGRESS_STEPS)
+            try:
+                yield from _with_deadline(func(conn, *args, **kwargs),
+                                          deadline)
+            except QueryTimeoutError:
+                raise
+            except sqlite3.OperationalError as e:
+                timeout_error = _timeout_error(e, deadline)
+                if timeout_error is None:
+                    raise
+                raise timeout_error from e
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        return gen_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
         conn = sqlite3.connect("users.db")
+        if deadline is not None:
+            conn.set_progress_handler(_deadline_handler(deadline),
+                                      _PROGRESS_STEPS)
+        token = _deadline.set(deadline)
         try:
             return func(conn, *args, **kwargs)
+        except QueryTimeoutError:
+            raise
+        except sqlite3.OperationalError as e:
+            timeout_error = _timeout_error(e, deadline)
+            if timeout_error is None:
+                raise
+            raise timeout_error from e
         finally:
+            _deadline.reset(token)
             try:
                 conn.close()
             except Exception:
@@ -23,25 +152,252 @@ def with_db_connection(func):
     return wrapper
 
 
-def retry_on_failure(retries=3, delay=2):
+def is_transient_error(exc):
     """
-    Decorator factory that retries a function if it raises an exception.
+    Default retry predicate: only retry errors that may go away on their own,
+    i.e. sqlite3.OperationalError "database is locked" / "database is busy".
+    Programming errors (bad SQL, missing table, TypeError...) fail at once.
+    """
+    if not isinstance(exc, sqlite3.OperationalError):
+        return False
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+
+class RetryBudget:
+    """
+    Token bucket that caps retries to a fraction of calls.
+    Every call deposits `ratio` tokens (up to `max_tokens`) and every retry
+    withdraws one, so a struggling database is not flooded with retries.
+    Share one instance between decorators to get a global budget.
+    """
+
+    def __init__(self, ratio=0.2, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(max_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Take one token; return False when the budget is exhausted."""
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the function while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the database is unhealthy.
+    closed    -> calls go through; consecutive failures are counted
+    open      -> calls raise CircuitOpenError until `reset_timeout` elapses
+    half-open -> a single trial call decides between closed and open
+    Only errors matching `is_failure` (transient by default) trip the breaker.
+    Any other outcome of the trial (a result, an empty generator, a
+    non-transient error) proves the database answered and closes it; a
+    trial cut short (cancelled, interrupted) lets the next call retry.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0,
+                 is_failure=is_transient_error):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.is_failure = is_failure
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == "open" and elapsed >= self.reset_timeout:
+                self.state = "half-open"
+                return
+            raise CircuitOpenError("circuit open: database marked unhealthy")
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self, exc):
+        if not self.is_failure(exc):
+            # The database answered; the error is the caller's own
+            if self.state == "half-open":
+                self.record_success()
+            return
+        with self._lock:
+            self.failures += 1
+            if (self.state == "half-open"
+                    or self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def abort_trial(self):
+        """The trial never finished: reopen, letting the next call try."""
+        with self._lock:
+            if self.state == "half-open":
+                self.state = "open"
+                self.opened_at = time.monotonic() - self.reset_timeout
+
+
+def _backoff_delay(attempt, delay, backoff, max_delay, jitter):
+    """Exponential backoff for `attempt` (1-based), optional full jitter."""
+    ceiling = min(max_delay, delay * (backoff ** (attempt - 1)))
+    if jitter:
+        return random.uniform(0, ceiling)
+    return ceiling
+
+
+def retry_on_failure(retries=3, delay=2, backoff=2, max_delay=30, jitter=True,
+                     retry_if=is_transient_error, deadline=None, budget=None,
+                     breaker=None):
+    """
+    Decorator factory that retries a function if it raises a transient error.
     :param retries: number of attempts before giving up
-    :param delay: seconds to wait between retries
+    :param delay: base delay in seconds before the first retry
+    :param backoff: multiplier applied to the delay after every attempt
+    :param max_delay: upper bound for a single sleep
+    :param jitter: sleep a random time in [0, backoff delay] (full jitter)
+    :param retry_if: predicate deciding whether an exception is retryable
+    :param deadline: overall time limit in seconds for all attempts
+    :param budget: optional RetryBudget shared between callers
+    :param breaker: optional CircuitBreaker shared between callers
+    A call's query_timeout=<seconds> (or one set by an outer
+    with_db_connection) also bounds the retries: no backoff sleep may run
+    past the remaining budget.
     """
     def decorator(func):
+        def next_pause(e, attempt, started, call_deadline):
+            """Seconds to sleep before the next attempt, or None to give up."""
+            if breaker is not None:
+                breaker.record_failure(e)
+            if attempt >= retries or not retry_if(e):
+                return None
+            pause = _backoff_delay(attempt, delay, backoff, max_delay, jitter)
+            if (deadline is not None
+                    and time.monotonic() - started + pause > deadline):
+                return None
+            # Per-call query_timeout: never sleep into the remaining budget
+            if (call_deadline is not None
+                    and time.monotonic() + pause >= call_deadline):
+                return None
+            if budget is not None and not budget.withdraw():
+                return None
+            return pause
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.monotonic()
+                if budget is not None:
+                    budget.deposit()
+                call_deadline = _resolve_deadline(
+                    kwargs.pop("query_timeout", None))
+                token = _deadline.set(call_deadline)
+                try:
+                    for attempt in range(1, retries + 1):
+                        if breaker is not None:
+                            breaker.before_call()
+                        try:
+                            result = await func(*args, **kwargs)
+                        except Exception as e:
+                            pause = next_pause(e, attempt, started,
+                                               call_deadline)
+                            if pause is None:
+                                raise
+                            await asyncio.sleep(pause)
+                        except BaseException:
+                            if breaker is not None:
+                                breaker.abort_trial()
+                            raise
+                        else:
+                            if breaker is not None:
+                                breaker.record_success()
+                            return result
+                finally:
+                    _deadline.reset(token)
+            return async_wrapper
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                # Only the part up to the first row is retried: once rows
+                # have been handed to the caller a retry would repeat them
+                started = time.monotonic()
+                call_deadline = _resolve_deadline(
+                    kwargs.pop("query_timeout", None))
+                if budget is not None:
+                    budget.deposit()
+                for attempt in range(1, retries + 1):
+                    if breaker is not None:
+                        breaker.before_call()
+                    rows = _with_deadline(func(*args, **kwargs),
+                                          call_deadline)
+                    try:
+                        first = next(rows)
+                    except StopIteration:
+                        if breaker is not None:
+                            breaker.record_success()
+                        return
+                    except Exception as e:
+                        pause = next_pause(e, attempt, started, call_deadline)
+                        if pause is None:
+                            raise
+                        time.sleep(pause)
+                    except BaseException:
+                        if breaker is not None:
+                            breaker.abort_trial()
+                        raise
+                    else:
+                        if breaker is not None:
+                            breaker.record_success()
+                        yield first
+                        yield from rows
+                        return
+            return gen_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(1, retries + 1):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_exception = e
-                    if attempt < retries:
-                        time.sleep(delay)
+            started = time.monotonic()
+            if budget is not None:
+                budget.deposit()
+            call_deadline = _resolve_deadline(
+                kwargs.pop("query_timeout", None))
+            token = _deadline.set(call_deadline)
+            try:
+                for attempt in range(1, retries + 1):
+                    if breaker is not None:
+                        breaker.before_call()
+                    try:
+                        result = func(*args, **kwargs)
+                    except Exception as e:
+                        pause = next_pause(e, attempt, started, call_deadline)
+                        if pause is None:
+                            raise
+                        time.sleep(pause)
+                    except BaseException:
+                        if breaker is not None:
+                            breaker.abort_trial()
+                        raise
                     else:
-                        raise last_exception
+                        if breaker is not None:
+                            breaker.record_success()
+                        return result
+            finally:
+                _deadline.reset(token)
         return wrapper
     return decorator
 
@@ -54,6 +410,23 @@ def fetch_users_with_retry(conn):
     return cursor.fetchall()
 
 
+@with_db_connection
+@retry_on_failure(retries=3, delay=1)
+def stream_users_with_retry(conn, arraysize=500):
+    """Yield users row by row, fetching `arraysize` rows per round trip."""
+    cursor = conn.cursor()
+    cursor.arraysize = arraysize
+    try:
+        cursor.execute("SELECT * FROM users")
+        while True:
+            rows = cursor.fetchmany()
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+
 if __name__ == "__main__":
     users = fetch_users_with_retry()
     print(users)
@@ -1,40 +1,308 @@
 #!/usr/bin/env python3
 import time
+import asyncio
 import sqlite3
+import inspect
 import functools
+import threading
+import contextvars
 
 query_cache = {}
+_expiry = {}  # query -> (fresh_until, stale_until); absent means no expiry
+_inflight = {}  # query -> asyncio.Future shared by concurrent async callers
+_refreshing = set()  # queries with a background refresh running
+_refresh_tasks = set()  # strong refs so refresh tasks are not GC'd
+_refresh_lock = threading.Lock()
+query_metrics = {"timeouts": 0}
+_deadline = contextvars.ContextVar("query_deadline", default=None)
+_PROGRESS_STEPS = 1000  # VM instructions between deadline checks
+
+
+class QueryTimeoutError(sqlite3.OperationalError):
+    """Raised when a statement was interrupted because its deadline passed."""
+
+
+def _resolve_deadline(timeout):
+    """Absolute deadline `timeout` seconds from now, capped by an outer one."""
+    outer = _deadline.get()
+    if timeout is None:
+        return outer
+    deadline = time.monotonic() + timeout
+    return deadline if outer is None else min(outer, deadline)
+
+
+def _deadline_handler(deadline):
+    # SQLite calls this every _PROGRESS_STEPS instructions; returning True
+    # aborts the running statement with OperationalError("interrupted")
+    return lambda: time.monotonic() >= deadline
+
+
+def _timeout_error(exc, deadline):
+    """Turn an "interrupted" error past the deadline into QueryTimeoutError."""
+    if deadline is None or "interrupted" not in str(exc):
+        return None
+    query_metrics["timeouts"] += 1
+    return QueryTimeoutError(f"query exceeded its deadline: {exc}")
+
+
+def _with_deadline(rows, deadline):
+    """
+    Yield from generator `rows` with _deadline set only while its code
+    runs, so nested decorators see the deadline but the consumer does not
+    between rows.
+    """
+    try:
+        while True:
+            token = _deadline.set(deadline)
+            try:
+                row = next(rows)
+            except StopIteration:
+                return
+            finally:
+                _deadline.reset(token)
+            yield row
+    finally:
+        rows.close()
+
 
 def with_db_connection(func):
-    """Decorator to create and close DB connection automatically"""
+    """
+    Decorator to create and close DB connection automatically.
+    Generator functions keep theirs open for as long as the generator
+    is consumed. Pass query_timeout=<seconds> to any call to interrupt
+    the running statement once the deadline passes (QueryTimeoutError).
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            import aiosqlite  # only needed by async callers
+            deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
+            conn = await aiosqlite.connect(":memory:")
+            token = _deadline.set(deadline)
+            try:
+                await conn.execute("CREATE TABLE IF NOT EXISTS users "
+                                   "(id INTEGER, name TEXT)")
+                await conn.execute("INSERT INTO users (id, name) "
+                                   "VALUES (1, 'Alice')")
+                await conn.execute("INSERT INTO users (id, name) "
+                                   "VALUES (2, 'Bob')")
+                await conn.commit()
+                if deadline is not None:
+                    await conn.set_progress_handler(
+                        _deadline_handler(deadline), _PROGRESS_STEPS)
+
+                return await func(conn, *args, **kwargs)
+            except QueryTimeoutError:
+                raise
+            except sqlite3.OperationalError as e:
+                timeout_error = _timeout_error(e, deadline)
+                if timeout_error is None:
+                    raise
+                raise timeout_error from e
+            finally:
+                _deadline.reset(token)
+                await conn.close()
+        return async_wrapper
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def gen_wrapper(*args, **kwargs):
+            # Keep the connection open until the caller finishes (or closes)
+            # the generator, not just until the generator object is created
+            deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
+            conn = _sample_connection(deadline)
+            try:
+                yield from _with_deadline(func(conn, *args, **kwargs),
+                                          deadline)
+            except QueryTimeoutError:
+                raise
+            except sqlite3.OperationalError as e:
+                timeout_error = _timeout_error(e, deadline)
+                if timeout_error is None:
+                    raise
+                raise timeout_error from e
+            finally:
+                conn.close()
+        return gen_wrapper
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        conn = sqlite3.connect(":memory:")  # Using in-memory DB for testing
+        deadline = _resolve_deadline(kwargs.pop("query_timeout", None))
+        conn = _sample_connection(deadline)
+        token = _deadline.set(deadline)
         try:
-            # Create a sample table and insert data (for demonstration)
-            cursor = conn.cursor()
-            cursor.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER, name TEXT)")
-            cursor.execute("INSERT INTO users (id, name) VALUES (1, 'Alice')")
-            cursor.execute("INSERT INTO users (id, name) VALUES (2, 'Bob')")
-            conn.commit()
-
             return func(conn, *args, **kwargs)
+        except QueryTimeoutError:
+            raise
+        except sqlite3.OperationalError as e:
+            timeout_error = _timeout_error(e, deadline)
+            if timeout_error is None:
+                raise
+            raise timeout_error from e
         finally:
+            _deadline.reset(token)
             conn.close()
     return wrapper
 
 
-def cache_query(func):
-    """Decorator to cache results of SQL queries"""
+def _sample_connection(deadline=None):
+    """
+    In-memory DB seeded with sample users (for demonstration); with a
+    deadline, statements run after seeding are interrupted once it passes.
+    """
+    conn = sqlite3.connect(":memory:")  # Using in-memory DB for testing
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS users (id INTEGER, name TEXT)")
+    cursor.execute("INSERT INTO users (id, name) VALUES (1, 'Alice')")
+    cursor.execute("INSERT INTO users (id, name) VALUES (2, 'Bob')")
+    conn.commit()
+    if deadline is not None:
+        conn.set_progress_handler(_deadline_handler(deadline),
+                                  _PROGRESS_STEPS)
+    return conn
+
+
+def _store(query, result, ttl, stale_ttl, negative_ttl):
+    """Cache a result; empty results use the (short) negative TTL if set."""
+    query_cache[query] = result
+    negative = not result and negative_ttl is not None
+    lifetime = negative_ttl if negative else ttl
+    if lifetime is None:
+        _expiry.pop(query, None)
+        return
+    now = time.monotonic()
+    # Negative entries are never served stale: they simply expire
+    grace = 0 if negative else stale_ttl
+    _expiry[query] = (now + lifetime, now + lifetime + grace)
+
+
+def _lookup(query):
+    """Return "fresh", "stale" or None (missing/expired) for a query."""
+    if query not in query_cache:
+        return None
+    expiry = _expiry.get(query)
+    if expiry is None:
+        return "fresh"
+    now = time.monotonic()
+    if now < expiry[0]:
+        return "fresh"
+    if now < expiry[1]:
+        return "stale"
+    return None
+
+
+def _claim_refresh(query):
+    """Return True if the caller should start the (single) refresh of query."""
+    with _refresh_lock:
+        if query in _refreshing:
+            return False
+        _refreshing.add(query)
+        return True
+
+
+def _release_refresh(query):
+    with _refresh_lock:
+        _refreshing.discard(query)
+
+
+def cache_query(func=None, *, ttl=None, stale_ttl=0, negative_ttl=None,
+                connect=with_db_connection):
+    """
+    Decorator to cache results of SQL queries.
+    :param ttl: seconds a result stays fresh (None: cache forever)
+    :param stale_ttl: extra seconds an expired result is still served while
+        one background refresh fetches a new copy (stale-while-revalidate)
+    :param negative_ttl: seconds to cache empty results (absent rows)
+    :param connect: decorator giving background refreshes their own
+        connection, since the caller's one is closed as soon as it returns
+    Coroutine functions share the same cache; concurrent awaits of an
+    uncached query wait for a single execution instead of each running it.
+    """
+    if func is None:
+        return functools.partial(cache_query, ttl=ttl, stale_ttl=stale_ttl,
+                                 negative_ttl=negative_ttl, connect=connect)
+
+    refresh = connect(func)
+
+    if inspect.iscoroutinefunction(func):
+        async def background_refresh(query):
+            try:
+                result = await refresh(query=query)
+                _store(query, result, ttl, stale_ttl, negative_ttl)
+            except Exception:
+                pass  # keep serving the stale copy until it fully expires
+            finally:
+                _release_refresh(query)
+
+        @functools.wraps(func)
+        async def async_wrapper(conn, query):
+            while True:
+                state = _lookup(query)
+                if state == "stale" and _claim_refresh(query):
+                    print("Serving stale result, refreshing in background...")
+                    task = asyncio.get_running_loop().create_task(
+                        background_refresh(query))
+                    _refresh_tasks.add(task)
+                    task.add_done_callback(_refresh_tasks.discard)
+                    return query_cache[query]
+                if state is not None:
+                    print("Using cached result...")
+                    return query_cache[query]
+                pending = _inflight.get(query)
+                if pending is None:
+                    break
+                print("Waiting for in-flight query...")
+                try:
+                    return await asyncio.shield(pending)
+                except asyncio.CancelledError:
+                    if not pending.cancelled():
+                        raise  # this caller was cancelled
+                    # The caller running the query was cancelled, not us:
+                    # take over (or wait for whoever took over first)
+            print("Executing query...")
+            pending = asyncio.get_running_loop().create_future()
+            _inflight[query] = pending
+            try:
+                result = await func(conn, query)
+            except asyncio.CancelledError:
+                pending.cancel()  # waiters re-run the query themselves
+                raise
+            except BaseException as e:
+                pending.set_exception(e)
+                pending.exception()  # mark retrieved if nobody was waiting
+                raise
+            else:
+                _store(query, result, ttl, stale_ttl, negative_ttl)
+                pending.set_result(result)
+                return result
+            finally:
+                del _inflight[query]
+        return async_wrapper
+
+    def background_refresh(query):
+        try:
+            result = refresh(query=query)
+            _store(query, result, ttl, stale_ttl, negative_ttl)
+        except Exception:
+            pass  # keep serving the stale copy until it fully expires
+        finally:
+            _release_refresh(query)
+
     @functools.wraps(func)
     def wrapper(conn, query):
-        if query in query_cache:
+        state = _lookup(query)
+        if state == "stale" and _claim_refresh(query):
+            print("Serving stale result, refreshing in background...")
+            threading.Thread(target=background_refresh, args=(query,),
+                             daemon=True).start()
+            return query_cache[query]
+        if state is not None:
             print("Using cached result...")
             return query_cache[query]
         else:
             print("Executing query...")
             result = func(conn, query)
-            query_cache[query] = result
+            _store(query, result, ttl, stale_ttl, negative_ttl)
             return result
     return wrapper
 
@@ -0,0 +1,201 @@
+#!/usr/bin/python3
+"""
+5-batch_loader.py
+
+DataLoader-style batching for point lookups.
+Instead of one "SELECT ... WHERE id = ?" per get_user_by_id call, lookups
+are queued and resolved together with a single "WHERE id IN (...)" query,
+then fanned back out to each caller. Results are memoized per loader, so
+create one loader per request scope.
+Usage:
+    loader = UserLoader()
+    pending = [loader.load(user_id) for user_id in user_ids]
+    users = [p.get() for p in pending]       # one query for all ids
+
+    users = await asyncio.gather(*(loader.aload(i) for i in user_ids))
+"""
+import asyncio
+import threading
+
+with_db_connection = __import__('1-with_db_connection').with_db_connection
+
+
+class Pending:
+    """Handle for a queued lookup; get() dispatches the batch if needed."""
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._event = threading.Event()
+        self._value = None
+        self._error = None
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def _resolve(self, value=None, error=None):
+        self._value = value
+        self._error = error
+        with self._callbacks_lock:
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def done(self):
+        return self._event.is_set()
+
+    def add_done_callback(self, callback):
+        """Call callback() once resolved (now, if it already is)."""
+        with self._callbacks_lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def get(self):
+        if not self._event.is_set():
+            self._loader.dispatch()
+            # Another thread may have taken this key and still be querying
+            self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+class BatchLoader:
+    """
+    Collects keys passed to load() and resolves them with batch_fn(keys),
+    which must return a dict {key: value}; keys it omits resolve to None.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=500, cache=True):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.cache = cache
+        self.batches = 0
+        self._cache = {}
+        self._queue = {}
+        self._dispatch_scheduled = False  # by aload, not yet started
+        self._lock = threading.Lock()
+
+    def load(self, key):
+        """Queue a lookup and return its Pending handle (memoized per key)."""
+        with self._lock:
+            pending = self._cache.get(key) or self._queue.get(key)
+            if pending is None:
+                pending = Pending(self)
+                self._queue[key] = pending
+                if self.cache:
+                    self._cache[key] = pending
+            return pending
+
+    def load_many(self, keys):
+        pending = [self.load(key) for key in keys]
+        return [p.get() for p in pending]
+
+    async def aload(self, key):
+        """
+        Async lookup: keys queued by coroutines running in the same event
+        loop tick (e.g. under asyncio.gather) share one query, which runs
+        on the default executor so the event loop is never blocked.
+        Only the query takes an executor thread; callers wait on loop
+        futures resolved from it.
+        """
+        pending = self.load(key)
+        await asyncio.sleep(0)  # let sibling coroutines queue their keys
+        if pending.done():
+            return pending.get()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def settle():
+            if future.done():
+                return  # this caller was cancelled
+            if pending._error is not None:
+                future.set_exception(pending._error)
+            else:
+                future.set_result(pending._value)
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(settle)
+            except RuntimeError:
+                pass  # loop already closed: nobody is awaiting
+
+        pending.add_done_callback(wake)
+        with self._lock:
+            start = (self._queue.get(key) is pending
+                     and not self._dispatch_scheduled)
+            if start:
+                self._dispatch_scheduled = True
+        if start:
+            dispatching = loop.run_in_executor(None, self.dispatch)
+            # dispatch() already failed the keys; just mark it retrieved
+            dispatching.add_done_callback(
+                lambda done: done.cancelled() or done.exception())
+        return await future
+
+    def dispatch(self):
+        """Resolve every queued key, max_batch_size keys per query."""
+        with self._lock:
+            queued, self._queue = self._queue, {}
+            # Keys queued from now on need a dispatch of their own
+            self._dispatch_scheduled = False
+        keys = list(queued)
+        try:
+            for start in range(0, len(keys), self.max_batch_size):
+                chunk = keys[start:start + self.max_batch_size]
+                self.batches += 1
+                try:
+                    found = self.batch_fn(chunk)
+                except Exception as e:
+                    self._fail(queued, chunk, e)
+                    continue
+                for key in chunk:
+                    queued[key]._resolve(found.get(key))
+        finally:
+            # Interrupted (KeyboardInterrupt...): never strand the waiters
+            unresolved = [key for key in keys if not queued[key].done()]
+            if unresolved:
+                self._fail(queued, unresolved,
+                           RuntimeError("batch dispatch was interrupted"))
+
+    def _fail(self, queued, keys, error):
+        # Do not memoize failures: a later load() may retry the key
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+        for key in keys:
+            queued[key]._resolve(error=error)
+
+    def clear(self, key=None):
+        """Forget one memoized key, or all of them when key is None."""
+        with self._lock:
+            if key is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(key, None)
+
+
+@with_db_connection
+def get_users_by_ids(conn, user_ids):
+    placeholders = ", ".join("?" for _ in user_ids)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT * FROM users WHERE id IN ({placeholders})", tuple(user_ids)
+    )
+    return {row[0]: row for row in cursor.fetchall()}
+
+
+class UserLoader(BatchLoader):
+    """Batched replacement for get_user_by_id."""
+
+    def __init__(self, max_batch_size=500, cache=True):
+        super().__init__(get_users_by_ids, max_batch_size, cache)
+
+
+if __name__ == "__main__":
+    loader = UserLoader()
+    pending = [loader.load(user_id) for user_id in (1, 2, 3, 2, 1)]
+    for p in pending:
+        print(p.get())
+    print(f"Queries issued: {loader.batches}")
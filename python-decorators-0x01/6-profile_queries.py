@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Task 6: Profiling Database Queries
+
+profile_queries times every call of a query function (same calling style as
+log_queries: the SQL is passed as `query`). Calls slower than `threshold`
+seconds get their EXPLAIN QUERY PLAN captured once per SQL shape, and plans
+that scan a whole table are flagged. Timings are aggregated per fingerprint
+(SQL with literals replaced by ?) into query_stats; profile_report() dumps
+count, total, p50, p95 and max so we know which indexes to add.
+"""
+
+import re
+import time
+import sqlite3
+import functools
+from collections import deque
+
+query_stats = {}
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(query):
+    """Normalize SQL so queries differing only by literals share stats."""
+    shape = _STRING_LITERAL.sub("?", query)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip().lower()
+
+
+def _explain(conn, query, params):
+    if params is None:
+        params = (None,) * query.count("?")
+    cursor = conn.execute("EXPLAIN QUERY PLAN " + query, params)
+    return [row[-1] for row in cursor.fetchall()]
+
+
+def _is_full_scan(detail):
+    # "SCAN users" (or "SCAN TABLE users" on older SQLite) without an index
+    return detail.startswith("SCAN") and "INDEX" not in detail
+
+
+def _percentile(ordered, pct):
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def profile_queries(threshold=0.1, db_path="users.db", samples=10000):
+    """
+    Decorator factory that profiles SQL query executions.
+    :param threshold: seconds above which a call counts as slow
+    :param db_path: database used for EXPLAIN when no connection is passed
+    :param samples: most recent durations kept per fingerprint for percentiles
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                query = kwargs.get("query")
+                if query is None:
+                    query = next((a for a in args if isinstance(a, str)), None)
+                if query is not None:
+                    conn = next((a for a in args
+                                 if isinstance(a, sqlite3.Connection)), None)
+                    _record(query, kwargs.get("params"), elapsed, threshold,
+                            conn, db_path, samples)
+        return wrapper
+    return decorator
+
+
+def _record(query, params, elapsed, threshold, conn, db_path, samples):
+    key = fingerprint(query)
+    stats = query_stats.get(key)
+    if stats is None:
+        stats = query_stats[key] = {
+            "count": 0,
+            "total": 0.0,
+            "max": 0.0,
+            "durations": deque(maxlen=samples),
+            "slow": 0,
+            "plan": None,
+            "full_scan": False,
+        }
+    stats["count"] += 1
+    stats["total"] += elapsed
+    stats["max"] = max(stats["max"], elapsed)
+    stats["durations"].append(elapsed)
+    if elapsed < threshold:
+        return
+    stats["slow"] += 1
+    if stats["plan"] is not None:
+        return
+    try:
+        if conn is not None:
+            plan = _explain(conn, query, params)
+        else:
+            explain_conn = sqlite3.connect(db_path)
+            try:
+                plan = _explain(explain_conn, query, params)
+            finally:
+                explain_conn.close()
+    except sqlite3.Error as e:
+        plan = [f"EXPLAIN failed: {e}"]
+    stats["plan"] = plan
+    stats["full_scan"] = any(_is_full_scan(detail) for detail in plan)
+
+
+def profile_report():
+    """Return per-fingerprint stats, slowest total time first."""
+    report = []
+    for key, stats in query_stats.items():
+        ordered = sorted(stats["durations"])
+        report.append({
+            "query": key,
+            "count": stats["count"],
+            "total": stats["total"],
+            "p50": _percentile(ordered, 50),
+            "p95": _percentile(ordered, 95),
+            "max": stats["max"],
+            "slow": stats["slow"],
+            "full_scan": stats["full_scan"],
+            "plan": stats["plan"],
+        })
+    report.sort(key=lambda entry: entry["total"], reverse=True)
+    return report
+
+
+def print_profile_report():
+    for entry in profile_report():
+        flag = "  [FULL SCAN]" if entry["full_scan"] else ""
+        print(f"{entry['query']}{flag}")
+        print(f"    count={entry['count']} "
+              f"total={entry['total'] * 1000:.1f}ms "
+              f"p50={entry['p50'] * 1000:.2f}ms "
+              f"p95={entry['p95'] * 1000:.2f}ms "
+              f"max={entry['max'] * 1000:.2f}ms slow={entry['slow']}")
+        for detail in entry["plan"] or ():
+            print(f"    plan: {detail}")
+
+
+@profile_queries(threshold=0.0)
+def fetch_all_users(query):
+    conn = sqlite3.connect('users.db')
+    cursor = conn.cursor()
+    cursor.execute(query)
+    results = cursor.fetchall()
+    conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    fetch_all_users(query="SELECT * FROM users")
+    fetch_all_users(query="SELECT * FROM users WHERE id = 1")
+    fetch_all_users(query="SELECT * FROM users WHERE id = 2")
+    print_profile_report()
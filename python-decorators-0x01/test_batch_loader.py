@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Unit tests for 5-batch_loader.BatchLoader"""
+import time
+import asyncio
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+BatchLoader = __import__('5-batch_loader').BatchLoader
+
+
+class TestBatchLoader(unittest.TestCase):
+    """Batching, memoization and concurrency of BatchLoader."""
+
+    def setUp(self):
+        """A loader whose batch function records the keys it was given."""
+        self.calls = []
+
+        def batch_fn(keys):
+            self.calls.append(list(keys))
+            return {key: key * 10 for key in keys if key > 0}
+
+        self.loader = BatchLoader(batch_fn, max_batch_size=3)
+
+    def test_one_query_per_batch(self):
+        """Queued keys are resolved together, max_batch_size at a time."""
+        pending = [self.loader.load(key) for key in (1, 2, 1, 3, 4, 0)]
+        self.assertEqual([p.get() for p in pending],
+                         [10, 20, 10, 30, 40, None])
+        self.assertEqual(self.calls, [[1, 2, 3], [4, 0]])
+        self.assertEqual(self.loader.load_many([1, 4]), [10, 40])
+        self.assertEqual(len(self.calls), 2)
+
+    def test_failures_are_not_memoized(self):
+        """A failed batch fails its keys; a later load retries them."""
+        outcomes = [RuntimeError("down"), None]
+
+        def flaky(keys):
+            error = outcomes.pop(0)
+            if error is not None:
+                raise error
+            return {key: key for key in keys}
+
+        loader = BatchLoader(flaky)
+        with self.assertRaises(RuntimeError):
+            loader.load(1).get()
+        self.assertEqual(loader.load(1).get(), 1)
+
+    def test_get_waits_for_batch_in_flight(self):
+        """get() on a key another thread is querying waits for it."""
+        started = threading.Event()
+
+        def slow(keys):
+            started.set()
+            time.sleep(0.1)
+            return {key: key * 10 for key in keys}
+
+        loader = BatchLoader(slow)
+        first, second = loader.load(1), loader.load(2)
+        worker = threading.Thread(target=first.get)
+        worker.start()
+        started.wait()
+        self.assertEqual(second.get(), 20)
+        worker.join()
+
+    def test_interrupted_batch_releases_waiters(self):
+        """A batch aborted by a BaseException fails every queued key."""
+        def interrupted(keys):
+            raise KeyboardInterrupt
+
+        loader = BatchLoader(interrupted)
+        pending = loader.load(1)
+        with self.assertRaises(KeyboardInterrupt):
+            loader.dispatch()
+        self.assertTrue(pending.done())
+        with self.assertRaises(RuntimeError):
+            pending.get()
+
+    def test_aload_batches_without_blocking_the_loop(self):
+        """Gathered aload calls share one query run off the event loop."""
+        def slow(keys):
+            self.calls.append(list(keys))
+            time.sleep(0.2)
+            return {key: key * 10 for key in keys}
+
+        loader = BatchLoader(slow)
+        ticks = []
+
+        async def ticker():
+            for _ in range(10):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def main():
+            results = asyncio.gather(*(loader.aload(key) for key in (1, 2)))
+            await ticker()
+            return await results
+
+        self.assertEqual(asyncio.run(main()), [10, 20])
+        self.assertEqual(self.calls, [[1, 2]])
+        # The loop kept ticking while the 0.2 s query ran
+        self.assertLess(ticks[-1] - ticks[0], 0.2)
+
+    def test_aload_waiters_hold_no_threads(self):
+        """Gathered aload calls submit one dispatch, not one wait each."""
+        submitted = []
+
+        class CountingExecutor(ThreadPoolExecutor):
+            def submit(self, fn, *args, **kwargs):
+                submitted.append(fn)
+                return super().submit(fn, *args, **kwargs)
+
+        def slow(keys):
+            self.calls.append(list(keys))
+            time.sleep(0.02)  # every waiter is parked before it returns
+            return {key: key * 10 for key in keys}
+
+        loader = BatchLoader(slow, max_batch_size=3)
+
+        async def main():
+            executor = CountingExecutor(max_workers=2)
+            asyncio.get_running_loop().set_default_executor(executor)
+            first = await asyncio.gather(
+                *(loader.aload(key) for key in range(1, 21)))
+            again = await asyncio.gather(
+                *(loader.aload(key) for key in (1, 21)))
+            return first, again
+
+        first, again = asyncio.run(main())
+        self.assertEqual(first, [key * 10 for key in range(1, 21)])
+        self.assertEqual(again, [10, 210])
+        self.assertEqual(len(submitted), 2)
+        self.assertEqual(len(self.calls), 8)  # 7 batches of 3, then [21]
+
+    def test_aload_failure_reaches_every_waiter(self):
+        """A failed batch raises in each gathered aload."""
+        def down(keys):
+            raise RuntimeError("down")
+
+        loader = BatchLoader(down)
+
+        async def main():
+            return await asyncio.gather(
+                *(loader.aload(key) for key in (1, 2)),
+                return_exceptions=True)
+
+        errors = asyncio.run(main())
+        self.assertEqual([type(e) for e in errors],
+                         [RuntimeError, RuntimeError])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Unit tests for 4-cache_query.cache_query"""
+import time
+import asyncio
+import sqlite3
+import functools
+import threading
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+cache_module = __import__('4-cache_query')
+cache_query = cache_module.cache_query
+with_db_connection = cache_module.with_db_connection
+QueryTimeoutError = cache_module.QueryTimeoutError
+
+RUNAWAY = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL "
+           "SELECT i + 1 FROM n) SELECT COUNT(*) FROM n")
+
+
+def _raise_or_return(outcome):
+    """Raise outcome if it is an exception, else return it."""
+    if isinstance(outcome, BaseException):
+        raise outcome
+    return outcome
+
+
+class TestAsyncCacheQuery(unittest.TestCase):
+    """Single-flight execution of coroutine queries."""
+
+    def setUp(self):
+        """Start from an empty cache and keep the decorator quiet."""
+        cache_module.query_cache.clear()
+        cache_module._expiry.clear()
+        self.runs = []
+
+        @cache_query
+        async def fetch(conn, query):
+            self.runs.append(conn)
+            await asyncio.sleep(0.05)
+            return [(conn, query)]
+
+        self.fetch = fetch
+        quiet = redirect_stdout(StringIO())
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+
+    def tearDown(self):
+        """Leave no cached results behind."""
+        cache_module.query_cache.clear()
+        cache_module._expiry.clear()
+
+    def test_concurrent_callers_share_one_run(self):
+        """Concurrent awaits of one query run it once."""
+        async def main():
+            return await asyncio.gather(self.fetch("a", "q"),
+                                        self.fetch("b", "q"))
+
+        self.assertEqual(asyncio.run(main()), [[("a", "q")], [("a", "q")]])
+        self.assertEqual(self.runs, ["a"])
+
+    def test_cancelled_runner_does_not_cancel_waiters(self):
+        """A waiter takes over when the caller running the query stops."""
+        async def main():
+            first = asyncio.ensure_future(self.fetch("a", "q"))
+            await asyncio.sleep(0.01)
+            second = asyncio.ensure_future(self.fetch("b", "q"))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+            return await second
+
+        self.assertEqual(asyncio.run(main()), [("b", "q")])
+        self.assertEqual(self.runs, ["a", "b"])
+        self.assertEqual(cache_module._inflight, {})
+
+    def test_cancelled_waiter_does_not_cancel_runner(self):
+        """Cancelling a waiter leaves the running query alone."""
+        async def main():
+            first = asyncio.ensure_future(self.fetch("a", "q"))
+            await asyncio.sleep(0.01)
+            second = asyncio.ensure_future(self.fetch("b", "q"))
+            await asyncio.sleep(0.01)
+            second.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await second
+            return await first
+
+        self.assertEqual(asyncio.run(main()), [("a", "q")])
+        self.assertEqual(self.runs, ["a"])
+
+
+class TestCacheQueryExpiry(unittest.TestCase):
+    """TTL, stale-while-revalidate and negative caching."""
+
+    def setUp(self):
+        """Start from an empty cache and keep the decorator quiet."""
+        cache_module.query_cache.clear()
+        cache_module._expiry.clear()
+        self.outcomes = []  # returned (or raised) by successive runs
+        self.runs = []
+        self.gate = threading.Event()
+        self.gate.set()
+        quiet = redirect_stdout(StringIO())
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+
+    def tearDown(self):
+        """Let refreshes finish and leave no cached results behind."""
+        self.gate.set()
+        self.wait_for_refresh()
+        cache_module.query_cache.clear()
+        cache_module._expiry.clear()
+
+    def cached(self, **options):
+        """The test query under cache_query(**options); background
+        refreshes run it with the connection "refresh".
+        """
+        def run(conn, query):
+            self.runs.append(conn)
+            self.gate.wait(2)
+            return _raise_or_return(self.outcomes.pop(0))
+
+        def connect(func):
+            return functools.partial(func, "refresh")
+
+        return cache_query(connect=connect, **options)(run)
+
+    def wait_for_refresh(self):
+        """Block until no background refresh is running."""
+        for _ in range(200):
+            if not cache_module._refreshing:
+                return
+            time.sleep(0.005)
+        self.fail("background refresh did not finish")
+
+    def test_ttl_expiry(self):
+        """A result is served until ttl passes, then run again."""
+        self.outcomes = [["v1"], ["v2"]]
+        fetch = self.cached(ttl=0.05)
+        self.assertEqual((fetch("c", "q"), fetch("c", "q")),
+                         (["v1"], ["v1"]))
+        time.sleep(0.06)
+        self.assertEqual(fetch("c", "q"), ["v2"])
+        self.assertEqual(self.runs, ["c", "c"])
+
+    def test_stale_result_refreshed_once_in_background(self):
+        """Stale reads return at once and share a single refresh."""
+        self.outcomes = [["v1"], ["v2"]]
+        fetch = self.cached(ttl=0.05, stale_ttl=5)
+        fetch("c", "q")
+        time.sleep(0.06)
+        self.gate.clear()  # hold the refresh until every read is done
+        self.assertEqual([fetch("c", "q") for _ in range(3)], [["v1"]] * 3)
+        self.gate.set()
+        self.wait_for_refresh()
+        self.assertEqual(fetch("c", "q"), ["v2"])
+        self.assertEqual(self.runs, ["c", "refresh"])
+
+    def test_failed_refresh_keeps_stale_copy(self):
+        """A failing refresh keeps serving the stale copy until it
+        fully expires; the next stale read tries again.
+        """
+        self.outcomes = [["v1"], RuntimeError("down"), RuntimeError("down"),
+                         ["v2"]]
+        fetch = self.cached(ttl=0.05, stale_ttl=0.2)
+        fetch("c", "q")
+        time.sleep(0.06)
+        self.assertEqual(fetch("c", "q"), ["v1"])
+        self.wait_for_refresh()
+        self.assertEqual(fetch("c", "q"), ["v1"])
+        self.wait_for_refresh()
+        time.sleep(0.2)
+        self.assertEqual(fetch("c", "q"), ["v2"])
+        self.assertEqual(self.runs, ["c", "refresh", "refresh", "c"])
+
+    def test_negative_ttl(self):
+        """Empty results expire after negative_ttl and are never stale;
+        other results keep the plain ttl.
+        """
+        self.outcomes = [[], [], ["v1"], ["v2"]]
+        fetch = self.cached(ttl=None, stale_ttl=5, negative_ttl=0.05)
+        self.assertEqual((fetch("c", "q"), fetch("c", "q")), ([], []))
+        time.sleep(0.06)
+        self.assertEqual(fetch("c", "q"), [])
+        time.sleep(0.06)
+        self.assertEqual(fetch("c", "q"), ["v1"])
+        time.sleep(0.06)
+        self.assertEqual(fetch("c", "q"), ["v1"])
+        self.assertEqual(self.runs, ["c", "c", "c"])
+
+
+class TestWithDbConnection(unittest.TestCase):
+    """The sample connection lives as long as the caller needs it."""
+
+    def test_generator_keeps_connection_open(self):
+        """A generator function reads through an open connection."""
+        @with_db_connection
+        def names(conn):
+            for row in conn.execute("SELECT name FROM users ORDER BY id"):
+                yield row[0]
+
+        self.assertEqual(list(names()), ["Alice", "Bob"])
+
+    def test_query_timeout(self):
+        """Every function kind is interrupted past query_timeout."""
+        @with_db_connection
+        def count(conn):
+            return conn.execute(RUNAWAY).fetchone()
+
+        @with_db_connection
+        def rows(conn):
+            yield conn.execute(RUNAWAY).fetchone()
+
+        @with_db_connection
+        async def acount(conn):
+            async with conn.execute(RUNAWAY) as cursor:
+                return await cursor.fetchone()
+
+        with self.assertRaises(QueryTimeoutError):
+            count(query_timeout=0.05)
+        with self.assertRaises(QueryTimeoutError):
+            list(rows(query_timeout=0.05))
+        with self.assertRaises(QueryTimeoutError):
+            asyncio.run(acount(query_timeout=0.05))
+
+    def test_no_timeout_is_plain_error(self):
+        """Other operational errors pass through unchanged."""
+        @with_db_connection
+        def missing(conn):
+            return conn.execute("SELECT * FROM nope").fetchall()
+
+        with self.assertRaises(sqlite3.OperationalError) as caught:
+            missing(query_timeout=5)
+        self.assertNotIsInstance(caught.exception, QueryTimeoutError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Unit tests for 6-profile_queries"""
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+profile_module = __import__('6-profile_queries')
+fingerprint = profile_module.fingerprint
+profile_queries = profile_module.profile_queries
+profile_report = profile_module.profile_report
+
+
+class TestFingerprint(unittest.TestCase):
+    """Queries differing only by literals share a fingerprint."""
+
+    def test_literals_and_whitespace(self):
+        """Numbers and strings become ?; case and spacing are folded."""
+        self.assertEqual(
+            fingerprint("SELECT *  FROM users\n WHERE id = 42 "
+                        "AND name = 'O''Brien' AND score > 1.5"),
+            "select * from users where id = ? and name = ? and score > ?")
+
+    def test_identifiers_keep_digits(self):
+        """Digits inside names are not literals."""
+        self.assertEqual(fingerprint("SELECT col1 FROM t2 WHERE id = 7"),
+                         "select col1 from t2 where id = ?")
+
+
+class TestProfileQueries(unittest.TestCase):
+    """Timings, plan capture and the report."""
+
+    def setUp(self):
+        """An in-memory users table and empty stats."""
+        profile_module.query_stats.clear()
+        self.addCleanup(profile_module.query_stats.clear)
+        self.conn = sqlite3.connect(":memory:")
+        self.addCleanup(self.conn.close)
+        self.conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                          "email TEXT)")
+
+    def run_timed(self, durations, threshold=0.1):
+        """Run "SELECT ... WHERE id = <n>" once per duration, each
+        timed as taking that many seconds.
+        """
+        @profile_queries(threshold=threshold)
+        def run(conn, query):
+            return conn.execute(query).fetchall()
+
+        clock = []
+        for elapsed in durations:
+            clock += [100.0, 100.0 + elapsed]
+        with patch.object(profile_module.time, "perf_counter",
+                          side_effect=clock):
+            for n, _ in enumerate(durations):
+                run(self.conn, "SELECT * FROM users WHERE id = {}".format(n))
+
+    def test_plan_captured_once_above_threshold(self):
+        """Only slow calls count as slow; the plan is explained once."""
+        with patch.object(profile_module, "_explain",
+                          wraps=profile_module._explain) as explain:
+            self.run_timed([0.01, 0.2, 0.3, 0.05])
+        stats = profile_module.query_stats[
+            "select * from users where id = ?"]
+        self.assertEqual((stats["count"], stats["slow"]), (4, 2))
+        self.assertEqual(explain.call_count, 1)
+        self.assertIsNotNone(stats["plan"])
+
+    def test_full_scan_detection(self):
+        """A filter on an unindexed column is flagged, a key lookup is
+        not.
+        """
+        @profile_queries(threshold=0)
+        def run(conn, query):
+            return conn.execute(query).fetchall()
+
+        run(self.conn, "SELECT * FROM users WHERE id = 1")
+        run(self.conn, "SELECT * FROM users WHERE email = 'a@b.c'")
+        flags = {entry["query"]: entry["full_scan"]
+                 for entry in profile_report()}
+        self.assertEqual(flags, {
+            "select * from users where id = ?": False,
+            "select * from users where email = ?": True,
+        })
+
+    def test_report_percentiles(self):
+        """p50, p95, max and total come from the recorded durations."""
+        durations = [i / 1000 for i in range(101)]  # 0ms .. 100ms
+        self.run_timed(durations, threshold=1)
+        (entry,) = profile_report()
+        self.assertEqual(entry["count"], 101)
+        self.assertAlmostEqual(entry["p50"], 0.050, places=3)
+        self.assertAlmostEqual(entry["p95"], 0.095, places=3)
+        self.assertAlmostEqual(entry["max"], 0.1)
+        self.assertAlmostEqual(entry["total"], sum(durations))
+        self.assertEqual((entry["slow"], entry["plan"]), (0, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Unit tests for 3-retry_on_failure"""
+import os
+import time
+import asyncio
+import sqlite3
+import tempfile
+import unittest
+
+retry_module = __import__('3-retry_on_failure')
+CircuitBreaker = retry_module.CircuitBreaker
+CircuitOpenError = retry_module.CircuitOpenError
+retry_on_failure = retry_module.retry_on_failure
+with_db_connection = retry_module.with_db_connection
+_deadline = retry_module._deadline
+
+LOCKED = sqlite3.OperationalError("database is locked")
+
+
+def _raise_or_return(outcome):
+    """Raise outcome if it is an exception, else return it."""
+    if isinstance(outcome, BaseException):
+        raise outcome
+    return outcome
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Open, half-open and closed transitions of the breaker."""
+
+    def setUp(self):
+        """A breaker that opens on one failure and half-opens at once."""
+        self.breaker = CircuitBreaker(failure_threshold=1,
+                                      reset_timeout=0.05)
+
+        @retry_on_failure(retries=1, delay=0, breaker=self.breaker)
+        def call(outcome):
+            return _raise_or_return(outcome)
+
+        self.call = call
+
+    def open_breaker(self):
+        """Trip the breaker with a transient error."""
+        with self.assertRaises(sqlite3.OperationalError):
+            self.call(LOCKED)
+        self.assertEqual(self.breaker.state, "open")
+
+    def test_open_fails_fast_until_reset_timeout(self):
+        """An open breaker refuses calls without running them."""
+        self.open_breaker()
+        with self.assertRaises(CircuitOpenError):
+            self.call("ok")
+
+    def test_half_open_success_closes(self):
+        """A successful trial closes the breaker."""
+        self.open_breaker()
+        time.sleep(0.06)
+        self.assertEqual(self.call("ok"), "ok")
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_half_open_transient_failure_reopens(self):
+        """A transient failure during the trial opens it again."""
+        self.open_breaker()
+        time.sleep(0.06)
+        self.open_breaker()
+        with self.assertRaises(CircuitOpenError):
+            self.call("ok")
+
+    def test_half_open_other_error_closes(self):
+        """A non-transient error during the trial does not wedge it."""
+        self.open_breaker()
+        time.sleep(0.06)
+        with self.assertRaises(ValueError):
+            self.call(ValueError("bad input"))
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertEqual(self.call("ok"), "ok")
+
+    def test_half_open_interrupted_trial_allows_another(self):
+        """A trial cut short by a BaseException lets the next call try."""
+        self.open_breaker()
+        time.sleep(0.06)
+        with self.assertRaises(KeyboardInterrupt):
+            self.call(KeyboardInterrupt())
+        self.assertEqual(self.breaker.state, "open")
+        self.assertEqual(self.call("ok"), "ok")
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_half_open_empty_generator_closes(self):
+        """A generator trial yielding no rows still closes the breaker."""
+        @retry_on_failure(retries=1, delay=0, breaker=self.breaker)
+        def rows(outcome):
+            _raise_or_return(outcome)
+            yield from ()
+
+        with self.assertRaises(sqlite3.OperationalError):
+            list(rows(LOCKED))
+        time.sleep(0.06)
+        self.assertEqual(list(rows("ok")), [])
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_half_open_cancelled_coroutine_allows_another(self):
+        """A cancelled async trial does not leave the breaker half-open."""
+        @retry_on_failure(retries=1, delay=0, breaker=self.breaker)
+        async def slow(outcome):
+            await asyncio.sleep(1)
+            return _raise_or_return(outcome)
+
+        async def main():
+            task = asyncio.ensure_future(slow("ok"))
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.breaker.state, "half-open")
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        self.open_breaker()
+        time.sleep(0.06)
+        asyncio.run(main())
+        self.assertEqual(self.call("ok"), "ok")
+        self.assertEqual(self.breaker.state, "closed")
+
+
+class TestGeneratorDeadline(unittest.TestCase):
+    """query_timeout reaches generator functions and bounds retries."""
+
+    def setUp(self):
+        """Run in a scratch directory so users.db is a throwaway file."""
+        self.cwd = os.getcwd()
+        self.scratch = tempfile.TemporaryDirectory()
+        os.chdir(self.scratch.name)
+
+    def tearDown(self):
+        """Go back and remove the scratch directory."""
+        os.chdir(self.cwd)
+        self.scratch.cleanup()
+
+    def test_retry_generator_accepts_query_timeout(self):
+        """Standalone, the retry generator consumes query_timeout."""
+        @retry_on_failure(retries=1)
+        def rows():
+            yield _deadline.get()
+
+        before = time.monotonic()
+        (deadline,) = list(rows(query_timeout=5))
+        self.assertAlmostEqual(deadline - before, 5, delta=0.5)
+        self.assertIsNone(_deadline.get())
+
+    def test_deadline_reaches_nested_generators(self):
+        """with_db_connection shares its deadline with the retry layer."""
+        @with_db_connection
+        @retry_on_failure(retries=1)
+        def rows(conn):
+            yield _deadline.get()
+            yield _deadline.get()
+
+        stream = rows(query_timeout=5)
+        first = next(stream)
+        self.assertIsNotNone(first)
+        # The consumer's context is untouched between rows
+        self.assertIsNone(_deadline.get())
+        self.assertEqual(next(stream), first)
+
+    def test_retry_never_sleeps_past_query_timeout(self):
+        """Backoff that would outlive query_timeout gives up at once."""
+        @with_db_connection
+        @retry_on_failure(retries=3, delay=1, jitter=False)
+        def rows(conn):
+            raise LOCKED
+            yield
+
+        started = time.monotonic()
+        with self.assertRaises(sqlite3.OperationalError):
+            list(rows(query_timeout=0.5))
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""Unit tests for 2-transactional"""
+import os
+import time
+import queue
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+transactional_module = __import__('2-transactional')
+GroupCommitter = transactional_module.GroupCommitter
+transactional = transactional_module.transactional
+with_db_connection = transactional_module.with_db_connection
+QueryTimeoutError = transactional_module.QueryTimeoutError
+bulk_insert_users = transactional_module.bulk_insert_users
+bulk_update_user_emails = transactional_module.bulk_update_user_emails
+
+RUNAWAY = ("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL "
+           "SELECT i + 1 FROM n) SELECT COUNT(*) FROM n")
+
+
+def insert(conn, user_id):
+    """Insert one user row."""
+    conn.execute("INSERT INTO users (id) VALUES (?)", (user_id,))
+    return user_id
+
+
+class TestGroupCommitter(unittest.TestCase):
+    """Batching and per-call isolation of group commit."""
+
+    def setUp(self):
+        """An empty users table in a temporary database."""
+        self.scratch = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.scratch.name, "users.db")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY)")
+        conn.close()
+        self.committer = GroupCommitter(self.path, window=0.05)
+
+    def tearDown(self):
+        """Stop the committer and remove the database."""
+        self.committer.close()
+        self.scratch.cleanup()
+
+    def user_ids(self):
+        """Ids committed to the file, in order."""
+        conn = sqlite3.connect(self.path)
+        try:
+            return [row[0] for row in
+                    conn.execute("SELECT id FROM users ORDER BY id")]
+        finally:
+            conn.close()
+
+    def test_calls_share_transactions(self):
+        """Calls submitted together commit in one transaction."""
+        futures = [self.committer.submit(insert, i) for i in range(20)]
+        self.assertEqual([f.result(timeout=5) for f in futures],
+                         list(range(20)))
+        self.assertEqual(self.committer.commits, 1)
+        self.assertEqual(self.user_ids(), list(range(20)))
+
+    def test_failing_call_is_rolled_back_alone(self):
+        """A failing call fails only its own caller."""
+        futures = [self.committer.submit(insert, i) for i in (1, 2, 1, 3)]
+        self.assertEqual(futures[0].result(timeout=5), 1)
+        with self.assertRaises(sqlite3.IntegrityError):
+            futures[2].result(timeout=5)
+        self.assertEqual(futures[3].result(timeout=5), 3)
+        self.assertEqual(self.user_ids(), [1, 2, 3])
+
+    def test_grouped_transactional(self):
+        """@transactional(group_commit=...) blocks until committed."""
+        grouped = transactional(group_commit=self.committer)(insert)
+        threads = [threading.Thread(target=grouped, args=(i,))
+                   for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.user_ids(), list(range(10)))
+        self.assertLess(self.committer.commits, 10)
+
+    def test_submit_racing_close_is_not_stranded(self):
+        """A call submitted while close() runs still gets committed."""
+        class SlowQueue(queue.Queue):
+            """Queue that pauses before taking a call, not a stop marker."""
+
+            def put(self, item, *args, **kwargs):
+                if item is not None:
+                    time.sleep(0.05)
+                super().put(item, *args, **kwargs)
+
+        self.committer._queue = SlowQueue()  # before any thread reads it
+        futures = []
+        submitter = threading.Thread(
+            target=lambda: futures.append(self.committer.submit(insert, 2)))
+        submitter.start()
+        time.sleep(0.01)  # submit() is now queueing its call
+        self.committer.close()
+        submitter.join()
+        self.assertEqual(futures[0].result(timeout=2), 2)
+        self.assertEqual(self.user_ids(), [2])
+
+    def test_submit_after_close_restarts(self):
+        """close() flushes; a later submit starts a new thread."""
+        self.committer.submit(insert, 1).result(timeout=5)
+        self.committer.close()
+        self.assertEqual(self.committer.submit(insert, 2).result(timeout=5),
+                         2)
+        self.assertEqual(self.user_ids(), [1, 2])
+
+
+class TestQueryTimeout(unittest.TestCase):
+    """query_timeout is honoured by this copy of with_db_connection."""
+
+    def setUp(self):
+        """Run in a scratch directory so users.db is a throwaway file."""
+        self.cwd = os.getcwd()
+        self.scratch = tempfile.TemporaryDirectory()
+        os.chdir(self.scratch.name)
+
+    def tearDown(self):
+        """Go back and remove the scratch directory."""
+        os.chdir(self.cwd)
+        self.scratch.cleanup()
+
+    def test_runaway_transaction_times_out(self):
+        """A transactional call past its deadline is interrupted."""
+        @with_db_connection
+        @transactional
+        def count(conn):
+            return conn.execute(RUNAWAY).fetchone()
+
+        with self.assertRaises(QueryTimeoutError):
+            count(query_timeout=0.05)
+
+    def test_generator_times_out(self):
+        """A generator's statements are interrupted past the deadline."""
+        @with_db_connection
+        def rows(conn):
+            yield conn.execute(RUNAWAY).fetchone()
+
+        with self.assertRaises(QueryTimeoutError):
+            list(rows(query_timeout=0.05))
+
+
+class TestBulkExecute(unittest.TestCase):
+    """Chunked, lazily consumed bulk writes."""
+
+    def setUp(self):
+        """An empty users table in a scratch users.db."""
+        self.cwd = os.getcwd()
+        self.scratch = tempfile.TemporaryDirectory()
+        os.chdir(self.scratch.name)
+        conn = sqlite3.connect("users.db")
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, "
+                     "name TEXT, email TEXT)")
+        conn.close()
+
+    def tearDown(self):
+        """Go back and remove the scratch directory."""
+        os.chdir(self.cwd)
+        self.scratch.cleanup()
+
+    def users(self):
+        """(id, email) rows committed to the file."""
+        conn = sqlite3.connect("users.db")
+        try:
+            return conn.execute(
+                "SELECT id, email FROM users ORDER BY id").fetchall()
+        finally:
+            conn.close()
+
+    def test_input_is_consumed_lazily(self):
+        """Each chunk is written before the next one is read."""
+        produced = []
+
+        def rows():
+            for user_id in range(10):
+                produced.append(user_id)
+                yield user_id, "u{}".format(user_id), None
+
+        seen = []
+        execute_chunk = transactional_module._execute_chunk
+
+        def recording(conn, query, chunk):
+            seen.append(len(produced))
+            return execute_chunk(conn, query, chunk)
+
+        with patch.object(transactional_module, "_execute_chunk",
+                          recording):
+            stats = bulk_insert_users(rows(), chunk_size=4)
+        self.assertEqual(seen, [4, 8, 10])
+        self.assertEqual((stats["rows"], stats["changed"], stats["chunks"]),
+                         (10, 10, 3))
+
+    def test_failing_chunk_rolls_back_alone(self):
+        """Chunks before a failing one stay committed."""
+        rows = [(1, "a", None), (2, "b", None),
+                (3, "c", None), (1, "dup", None),
+                (4, "d", None)]
+        with self.assertRaises(sqlite3.IntegrityError):
+            bulk_insert_users(rows, chunk_size=2)
+        self.assertEqual(self.users(), [(1, None), (2, None)])
+
+    def test_stats_count_changed_rows(self):
+        """changed counts rows the query touched, rows every input."""
+        bulk_insert_users([(i, "u", None) for i in range(1, 4)])
+        stats = bulk_update_user_emails(
+            ((user_id, "{}@example.com".format(user_id))
+             for user_id in range(1, 6)), chunk_size=2)
+        self.assertEqual((stats["rows"], stats["changed"], stats["chunks"]),
+                         (5, 3, 3))
+        self.assertGreaterEqual(stats["rows_per_sec"], 0)
+        self.assertEqual([email for _, email in self.users()],
+                         ["1@example.com", "2@example.com", "3@example.com"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Unit tests for 1-with_db_connection.with_db_connection"""
+import os
+import time
+import tempfile
+import unittest
+
+db_module = __import__('1-with_db_connection')
+with_db_connection = db_module.with_db_connection
+_deadline = db_module._deadline
+
+
+class TestWithDbConnection(unittest.TestCase):
+    """Connection handling and query_timeout for every function kind."""
+
+    def setUp(self):
+        """Run in a scratch directory so users.db is a throwaway file."""
+        self.cwd = os.getcwd()
+        self.scratch = tempfile.TemporaryDirectory()
+        os.chdir(self.scratch.name)
+
+    def tearDown(self):
+        """Go back and remove the scratch directory."""
+        os.chdir(self.cwd)
+        self.scratch.cleanup()
+
+    def test_function_sees_deadline(self):
+        """A plain function runs with the call's deadline set."""
+        @with_db_connection
+        def deadline(conn):
+            return _deadline.get()
+
+        before = time.monotonic()
+        self.assertAlmostEqual(deadline(query_timeout=5) - before, 5,
+                               delta=0.5)
+        self.assertIsNone(deadline())
+
+    def test_generator_sees_deadline_and_keeps_connection(self):
+        """A generator runs with the deadline and an open connection."""
+        @with_db_connection
+        def rows(conn):
+            for value in (1, 2):
+                yield conn.execute("SELECT ?", (value,)).fetchone()[0], \
+                    _deadline.get()
+
+        stream = rows(query_timeout=5)
+        value, deadline = next(stream)
+        self.assertEqual(value, 1)
+        self.assertIsNotNone(deadline)
+        self.assertIsNone(_deadline.get())
+        self.assertEqual(next(stream), (2, deadline))
+        self.assertEqual(list(stream), [])
+
+
+if __name__ == "__main__":
+    unittest.main()